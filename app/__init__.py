@@ -3,13 +3,30 @@ import pymysql
 from sqlalchemy import text
 from app.config import Config
 from app.db import db
+from app.commands import register_commands
+from app.auth import init_auth
+from app.admission import init_admission
+from app.single_flight import init_single_flight
+from app.profiling import init_profiling, init_request_timing
+from app.metrics import init_metrics
+from app.maintenance import init_maintenance
+from app.events import init_events
+from app.result_cache import init_result_cache
+from app.contention import init_contention
+from app.sqlite_backend import engine_options as sqlite_engine_options, init_sqlite
 
-def create_app():
+def create_app(config_object='app.config.Config'):
     app = Flask(__name__)
-    app.config.from_object('app.config.Config')
+    app.config.from_object(config_object)
     uri = app.config.get('SQLALCHEMY_DATABASE_URI')
     print(uri)
+    if app.config.get('DB_BACKEND') == 'sqlite':
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), **sqlite_engine_options()
+        }
     db.init_app(app)
+    if app.config.get('DB_BACKEND') == 'sqlite':
+        init_sqlite(app)
     # 注册蓝图
     with app.app_context():
         try:
@@ -17,8 +34,21 @@ def create_app():
             print("在Flask应用上下文中，数据库连接成功")
         except Exception as e:
             print(f"在Flask应用上下文中，数据库连接失败: {e}")
+    # 计时须最先注册，被认证、准入控制拒绝的请求也计入指标
+    init_request_timing(app)
+    init_auth(app)
+    init_profiling(app)
+    # 结果缓存在请求合并、准入控制之前：命中时既不等待 leader 也不占准入名额
+    init_result_cache(app)
+    # 合并请求需在准入控制之前：follower 只占准入总量名额，不占接口名额
+    init_single_flight(app)
+    init_admission(app)
+    init_events(app)
+    init_contention(app)
     register_blueprints(app)
-
+    register_commands(app)
+    init_metrics(app)
+    init_maintenance(app)
 
     return app
 
@@ -30,9 +60,11 @@ def register_blueprints(app):
     from app.routes.order import order_bp
     from app.routes.return_ import return_bp  #return是Python关键字，通常文件名为return_.py
     from app.routes.statistic import statistic_bp
+    from app.routes.batch import batch_bp
 
     app.register_blueprint(basic_bp, url_prefix='/basic')
     app.register_blueprint(purchase_bp, url_prefix='/purchase')
     app.register_blueprint(order_bp, url_prefix='/order')
     app.register_blueprint(return_bp, url_prefix='/return')
-    app.register_blueprint(statistic_bp, url_prefix='/statistic')
\ No newline at end of file
+    app.register_blueprint(statistic_bp, url_prefix='/statistic')
+    app.register_blueprint(batch_bp)
@@ -0,0 +1,184 @@
+import threading
+import time
+
+from flask import current_app, g, request
+
+
+class Limiter:
+    """
+    并发上限 + 有界等待队列。
+    并发未满直接放行；已满时最多 queue_size 个请求排队等待，队列满或等待超时即拒绝。
+    """
+
+    def __init__(self, name, concurrency, queue_size=0):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=0):
+        with self._cond:
+            if self.active < self.concurrency:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue_size or timeout <= 0:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + timeout
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+class AdmissionController:
+    """
+    按接口分配 Limiter；另有一个总量 Limiter 限制受控接口与推送长连接合计占用的线程数（运行中 + 排队中），
+    保证写接口始终有空闲线程可用。
+    """
+
+    def __init__(self):
+        self.limiters = {}
+        self.total = None
+        self.enabled = True
+        self.endpoints = set()
+        self.exempt = set()
+        self.queue_timeout = 2
+        self.retry_after = 2
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        threads = config.get('WEB_THREADS', 4)
+        reserved = config.get('ADMISSION_RESERVED_THREADS', 1)
+        self.total = Limiter('total', max(1, threads - reserved))
+        self.enabled = config.get('ADMISSION_ENABLED', True)
+        self.endpoints = set(config.get('ADMISSION_ENDPOINTS', []))
+        self.exempt = set(config.get('ADMISSION_EXEMPT_ENDPOINTS', []))
+        self.queue_timeout = config.get('ADMISSION_QUEUE_TIMEOUT', 2)
+        self.retry_after = config.get('ADMISSION_RETRY_AFTER', 2)
+        self.default_limits = (config.get('ADMISSION_CONCURRENCY', 2), config.get('ADMISSION_QUEUE_SIZE', 4))
+        self.custom_limits = dict(config.get('ADMISSION_LIMITS', {}))
+        self.limiters = {}
+
+    def controlled(self, endpoint):
+        if not endpoint or endpoint in self.exempt:
+            return False
+        return endpoint.startswith('statistic.') or endpoint in self.endpoints
+
+    def limiter(self, endpoint):
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            with self._lock:
+                limiter = self.limiters.get(endpoint)
+                if limiter is None:
+                    concurrency, queue_size = self.custom_limits.get(endpoint, self.default_limits)
+                    limiter = Limiter(endpoint, concurrency, queue_size)
+                    self.limiters[endpoint] = limiter
+        return limiter
+
+    def enter(self, endpoint):
+        """先占总量名额（不等待），再占接口名额（可排队）；成功返回接口 Limiter，失败返回 None"""
+        if not self.total.acquire():
+            return None
+        limiter = self.limiter(endpoint)
+        if not limiter.acquire(self.queue_timeout):
+            self.total.release()
+            return None
+        return limiter
+
+    def leave(self, limiter):
+        limiter.release()
+        self.total.release()
+
+    def hold(self):
+        """
+        长连接（SSE 推送）在整个连接期间占一个总量名额（不等待、不排队）：
+        受控接口的可用线程相应减少，推送连接也用不到留给写接口的线程。名额已满返回 False。
+        """
+        if not self.enabled:
+            return True
+        return self.total.acquire()
+
+    def unhold(self):
+        if self.enabled:
+            self.total.release()
+
+    def stats(self):
+        return {
+            "total": self.total.stats() if self.total else None,
+            "endpoints": {name: limiter.stats() for name, limiter in sorted(self.limiters.items())},
+        }
+
+
+admission = AdmissionController()
+
+
+def busy_response():
+    return (
+        {"code": 503, "msg": "服务繁忙，请稍后重试"},
+        503,
+        {"Retry-After": str(admission.retry_after)},
+    )
+
+
+def admit():
+    """before_request：受控接口先占总量名额（不等待），再占接口名额（可排队）"""
+    if not current_app.config.get('ADMISSION_ENABLED', True):
+        return None
+    endpoint = request.endpoint
+    if not admission.controlled(endpoint):
+        return None
+    view = current_app.view_functions.get(endpoint)
+    if view is None or getattr(view, 'auth_public', False):
+        return None
+
+    limiter = admission.enter(endpoint)
+    if limiter is None:
+        return busy_response()
+    g.admission_limiter = limiter
+    return None
+
+
+def release(exc=None):
+    limiter = g.pop('admission_limiter', None)
+    if limiter is not None:
+        admission.leave(limiter)
+
+
+def init_admission(app):
+    admission.init_app(app)
+    app.before_request(admit)
+    app.teardown_request(release)
@@ -0,0 +1,207 @@
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from app.db import db
+
+
+# 热表 -> 归档表；列清单与热表一致
+_COLUMNS = {
+    't_order': ['order_id', 'order_time', 'user_id', 'total_amount', 'line_count'],
+    't_order_detail': ['order_id', 'isbn', 'order_qty', 'order_price'],
+    't_return': ['return_id', 'order_id', 'reason', 'return_time', 'user_id', 'total_amount', 'line_count'],
+    't_return_detail': ['return_id', 'isbn', 'return_qty'],
+    't_purchase': ['purchase_id', 'supplier_id', 'isbn', 'purchase_qty', 'purchase_price', 'purchase_time', 'user_id'],
+}
+
+# 订单与其退货一起归档（热表中的退货总能在热表中找到原订单），进货单单独归档
+SALES = 't_order'
+PURCHASES = 't_purchase'
+
+MIN_ARCHIVE_DAYS = 90
+
+
+def archived_before(table):
+    """返回早于该时间的单据可能已在归档表中；从未归档时返回 None"""
+    return db.session.execute(
+        text("SELECT archived_before FROM t_archive_state WHERE table_name = :name"), {"name": table}
+    ).scalar()
+
+
+def reaches_archive(table, start):
+    """查询区间起点早于归档水位时才需要读归档表；start 为 None 表示只查热表"""
+    if start is None:
+        return False
+    watermark = archived_before(table)
+    return watermark is not None and start < watermark
+
+
+def order_sources(start):
+    """(订单表, 订单明细表) 列表，区间触及归档时追加归档表"""
+    sources = [('t_order', 't_order_detail')]
+    if reaches_archive(SALES, start):
+        sources.append(('t_order_archive', 't_order_detail_archive'))
+    return sources
+
+
+def return_sources(start):
+    """(退货表, 退货明细表, 原订单明细表) 列表；归档退货的原订单也在归档表中"""
+    sources = [('t_return', 't_return_detail', 't_order_detail')]
+    if reaches_archive(SALES, start):
+        sources.append(('t_return_archive', 't_return_detail_archive', 't_order_detail_archive'))
+    return sources
+
+
+def purchase_sources(start):
+    sources = ['t_purchase']
+    if reaches_archive(PURCHASES, start):
+        sources.append('t_purchase_archive')
+    return sources
+
+
+def archive_cutoff(days, now=None):
+    """归档截止时间：now - days 所在月份的第一天，只归档完整的已结账月份"""
+    moment = (now or datetime.now()) - timedelta(days=days)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _raise_watermark(table, cutoff):
+    """先推进水位再搬数据，读请求一旦可能漏掉热表数据就已经会去读归档表"""
+    current = archived_before(table)
+    if current is None:
+        db.session.execute(
+            text("INSERT INTO t_archive_state (table_name, archived_before) VALUES (:name, :cutoff)"),
+            {"name": table, "cutoff": cutoff}
+        )
+    elif current < cutoff:
+        db.session.execute(
+            text("UPDATE t_archive_state SET archived_before = :cutoff WHERE table_name = :name"),
+            {"name": table, "cutoff": cutoff}
+        )
+    db.session.commit()
+
+
+def _move(table, key, ids):
+    """把热表中 key IN ids 的行复制到归档表（已存在则跳过）"""
+    columns = ', '.join(_COLUMNS[table])
+    verb = 'INSERT OR IGNORE' if db.engine.dialect.name == 'sqlite' else 'INSERT IGNORE'
+    db.session.execute(text(f"""
+        {verb} INTO {table}_archive ({columns})
+        SELECT {columns} FROM {table} WHERE {key} IN :ids
+    """).bindparams(bindparam('ids', expanding=True)), {"ids": ids})
+
+
+def _delete(table, key, ids):
+    db.session.execute(
+        text(f"DELETE FROM {table} WHERE {key} IN :ids").bindparams(bindparam('ids', expanding=True)),
+        {"ids": ids}
+    )
+
+
+def _archive_sales_batch(cutoff, batch_size):
+    """归档一批订单（连同其全部退货）；仍有截止时间之后退货的订单留在热表"""
+    order_ids = [r[0] for r in db.session.execute(text("""
+        SELECT o.order_id
+        FROM t_order o
+        WHERE o.order_time < :cutoff
+          AND NOT EXISTS (
+              SELECT 1 FROM t_return r WHERE r.order_id = o.order_id AND r.return_time >= :cutoff
+          )
+        ORDER BY o.order_time
+        LIMIT :n
+    """), {"cutoff": cutoff, "n": batch_size})]
+    if not order_ids:
+        return 0, 0
+    return_ids = [r[0] for r in db.session.execute(
+        text("SELECT return_id FROM t_return WHERE order_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+        {"ids": order_ids}
+    )]
+
+    if return_ids:
+        _move('t_return', 'return_id', return_ids)
+        _move('t_return_detail', 'return_id', return_ids)
+    _move('t_order', 'order_id', order_ids)
+    _move('t_order_detail', 'order_id', order_ids)
+    if return_ids:
+        _delete('t_return_detail', 'return_id', return_ids)
+        _delete('t_return', 'return_id', return_ids)
+    _delete('t_order_detail', 'order_id', order_ids)
+    _delete('t_order', 'order_id', order_ids)
+    db.session.commit()
+    return len(order_ids), len(return_ids)
+
+
+def _archive_purchase_batch(cutoff, batch_size):
+    purchase_ids = [r[0] for r in db.session.execute(text("""
+        SELECT purchase_id FROM t_purchase
+        WHERE purchase_time < :cutoff
+        ORDER BY purchase_time
+        LIMIT :n
+    """), {"cutoff": cutoff, "n": batch_size})]
+    if not purchase_ids:
+        return 0
+    _move('t_purchase', 'purchase_id', purchase_ids)
+    _delete('t_purchase', 'purchase_id', purchase_ids)
+    db.session.commit()
+    return len(purchase_ids)
+
+
+def archive_history(cutoff, batch_size=1000, batch_pause=0.2, max_batches=None, stop_event=None):
+    """
+    把 cutoff 之前的订单（连同退货）和进货单分批移到归档表，每批一个事务、批间暂停。
+    返回 {"cutoff", "orders", "returns", "purchases", "batches", "seconds"}。
+    """
+    started = time.perf_counter()
+    result = {"cutoff": cutoff, "orders": 0, "returns": 0, "purchases": 0, "batches": 0}
+
+    def keep_going():
+        if stop_event is not None and stop_event.is_set():
+            return False
+        return max_batches is None or result['batches'] < max_batches
+
+    for table, archive_batch in ((SALES, _archive_sales_batch), (PURCHASES, _archive_purchase_batch)):
+        _raise_watermark(table, cutoff)
+        while keep_going():
+            moved = archive_batch(cutoff, batch_size)
+            if table == SALES:
+                moved, returns = moved
+                result['orders'] += moved
+                result['returns'] += returns
+            else:
+                result['purchases'] += moved
+            if not moved:
+                break
+            result['batches'] += 1
+            if moved < batch_size:
+                break
+            if batch_pause:
+                time.sleep(batch_pause)
+
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def history_range(args):
+    """
+    解析历史查询的 from/to（YYYY-MM-DD，含两端），返回 (start, end)，未给出的一端为 None。
+    未给 from 时只查热表，格式错误时抛出 ValueError。
+    """
+    start = end = None
+    if args.get('from'):
+        start = datetime.strptime(args['from'], '%Y-%m-%d')
+    if args.get('to'):
+        end = datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1)
+    if start and end and end <= start:
+        raise ValueError("to不能早于from")
+    return start, end
+
+
+def range_condition(column, start, end):
+    """时间范围条件（参数名 :start / :end），没有范围时为恒真"""
+    conditions = []
+    if start is not None:
+        conditions.append(f"{column} >= :start")
+    if end is not None:
+        conditions.append(f"{column} < :end")
+    return " AND ".join(conditions) or "1 = 1"
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app, g, request
+from sqlalchemy import text
+
+from app.db import db
+
+
+class TokenCache:
+    """
+    进程内令牌缓存（LRU 有界）。
+    有效令牌缓存到 expire_time 与 TTL 上限中较早者，无效令牌做短期负缓存，
+    命中时不再访问 t_token。
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, negative_ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('AUTH_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('AUTH_CACHE_TTL', self.ttl)
+        self.negative_ttl = app.config.get('AUTH_NEGATIVE_TTL', self.negative_ttl)
+        self.clear()
+
+    def get(self, token):
+        """返回 (是否命中, 用户信息)，负缓存命中时用户信息为 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, token, user, expire_time=None):
+        now = time.time()
+        if user is None:
+            deadline = now + self.negative_ttl
+        else:
+            deadline = now + self.ttl
+            if expire_time is not None:
+                deadline = min(deadline, expire_time.timestamp())
+        with self._lock:
+            self._entries[token] = (user, deadline)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def public(view):
+    """标记无需认证的接口"""
+    view.auth_public = True
+    return view
+
+
+def token_in_query(view):
+    """标记允许用 access_token 查询参数传令牌的接口（EventSource 无法设置请求头）"""
+    view.auth_query_token = True
+    return view
+
+
+def _bearer_token(view=None):
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        if getattr(view, 'auth_query_token', False):
+            return request.args.get('access_token', '').strip() or None
+        return None
+    return token.strip()
+
+
+def resolve_token(token):
+    """令牌 -> 用户信息（含角色），优先走缓存；无效或过期返回 None"""
+    found, user = token_cache.get(token)
+    if found:
+        return user
+
+    row = db.session.execute(text("""
+        SELECT t.user_id, t.expire_time, u.username, u.role_id, r.role_name
+        FROM t_token t
+        INNER JOIN t_user u ON u.user_id = t.user_id
+        INNER JOIN t_role r ON r.role_id = u.role_id
+        WHERE t.token = :token
+        ORDER BY t.expire_time DESC
+        LIMIT 1
+    """), {"token": token}).mappings().first()
+
+    if not row or row['expire_time'] <= datetime.now():
+        token_cache.put(token, None)
+        return None
+
+    user = {
+        "user_id": row['user_id'],
+        "username": row['username'],
+        "role_id": row['role_id'],
+        "role_name": row['role_name'],
+    }
+    token_cache.put(token, user, row['expire_time'])
+    return user
+
+
+def authenticate():
+    """before_request：校验 Bearer 令牌并把用户信息放到 g.current_user"""
+    g.current_user = None
+    if not current_app.config.get('AUTH_ENABLED', True) or request.method == 'OPTIONS':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, 'auth_public', False):
+        return None
+
+    token = _bearer_token(view)
+    user = resolve_token(token) if token else None
+    if user is None:
+        return {"code": 401, "msg": "未登录或令牌已失效"}, 401, {"WWW-Authenticate": "Bearer"}
+    g.current_user = user
+    return None
+
+
+def current_user_id(data=None):
+    """已认证时取令牌对应的用户；仅在关闭认证时回退到请求体中的 user_id"""
+    user = g.get('current_user')
+    if user:
+        return user['user_id']
+    if not current_app.config.get('AUTH_ENABLED', True) and data:
+        return data.get('user_id')
+    return None
+
+
+def init_auth(app):
+    token_cache.init_app(app)
+    app.before_request(authenticate)
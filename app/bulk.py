@@ -0,0 +1,96 @@
+import codecs
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from sqlalchemy import text
+
+from app.db import db
+
+
+def chunked(iterable, size):
+    """按 size 分块迭代，每次只在内存中保留一块"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def upsert_statement(table, columns, keys):
+    """
+    单行 upsert 语句，配合参数列表 executemany 执行：
+    MySQL 为 INSERT ... ON DUPLICATE KEY UPDATE（PyMySQL 会把 executemany 改写为多行 INSERT），
+    SQLite 为 INSERT ... ON CONFLICT DO UPDATE
+    """
+    updates = [c for c in columns if c not in keys]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+    if db.engine.dialect.name == 'sqlite':
+        sql += f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET " + ', '.join(f"{c} = excluded.{c}" for c in updates)
+    else:
+        sql += " ON DUPLICATE KEY UPDATE " + ', '.join(f"{c} = VALUES({c})" for c in updates)
+    return text(sql)
+
+
+def insert_ignore_statement(table, columns):
+    """主键已存在时跳过的单行 INSERT，配合参数列表 executemany 执行"""
+    verb = 'INSERT OR IGNORE' if db.engine.dialect.name == 'sqlite' else 'INSERT IGNORE'
+    return text(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})")
+
+
+class StreamError(str):
+    """输入流本身无法继续解析（编码错误、CSV 格式错误）时产出的错误信息，之后不再有记录"""
+
+
+def iter_records(stream, fmt):
+    """
+    从二进制流逐行解析 CSV（首行为表头）或 NDJSON，产出 (行号, dict 或 错误信息)。
+    只按行读取，不把整个上传读入内存。流在中途无法解析时产出一条 StreamError 后结束。
+    """
+    if isinstance(stream, io.RawIOBase):
+        # werkzeug 的请求体流无缓冲，按行迭代会逐字节读取
+        stream = io.BufferedReader(stream, 64 * 1024)
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield reader.line_num + 1, StreamError(f"第{reader.line_num + 1}行起无法解析，已停止读取: {e}")
+        return
+
+    line_no = 0
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"JSON解析失败: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, "每行应为一个JSON对象"
+                continue
+            yield line_no, record
+    except UnicodeDecodeError as e:
+        yield line_no + 1, StreamError(f"第{line_no + 1}行起无法解码，已停止读取: {e}")
+
+
+def parse_price(value, max_value=Decimal('999999.99')):
+    """解析 Numeric(8, 2) 价格，非法时抛出 ValueError"""
+    try:
+        price = Decimal(str(value).strip())
+        if not price.is_finite():
+            raise ValueError
+        price = price.quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"价格格式错误: {value!r}")
+    if price < 0 or price > max_value:
+        raise ValueError(f"价格超出范围: {value!r}")
+    return price
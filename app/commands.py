@@ -0,0 +1,223 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, text
+
+from app.archive import MIN_ARCHIVE_DAYS, archive_cutoff, archive_history
+from app.db import db
+from app.maintenance import purge_expired_tokens
+from app.purchase_rollup import build_rollup
+from app.ranking import build_snapshots
+from app.result_cache import result_cache
+from app.supply_index import refresh_supply_best
+from app.totals import TOTALS, backfill_totals, check_totals
+
+
+def create_missing_indexes():
+    """
+    为已有数据库补建模型中声明、但库里还没有的二级索引。
+    已存在同名索引，或已有索引以相同列开头（如 MySQL 为外键自动建的索引）时跳过。
+    返回新建的索引名列表。
+    """
+    import app.models  # noqa: F401  确保模型已注册到 metadata
+
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables or not table.indexes:
+            continue
+        existing = inspector.get_indexes(table.name)
+        pk = inspector.get_pk_constraint(table.name).get('constrained_columns') or []
+        existing_columns = [idx['column_names'] for idx in existing] + [pk]
+        existing_names = {idx['name'] for idx in existing}
+
+        for index in table.indexes:
+            columns = [c.name for c in index.columns]
+            if index.name in existing_names:
+                continue
+            if any(cols[:len(columns)] == columns for cols in existing_columns):
+                continue
+            index.create(db.engine)
+            created.append(index.name)
+    return created
+
+
+def create_missing_columns():
+    """
+    为已有数据库补建模型中新增、但库里还没有的列（按 server_default 填充已有行）。
+    返回新建的 "表.列" 列表。
+    """
+    import app.models  # noqa: F401
+
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    dialect = db.engine.dialect
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql(ddl)
+            created.append(f"{table.name}.{column.name}")
+    return created
+
+
+@click.command('create-columns')
+@with_appcontext
+def create_columns_command():
+    """补建模型中新增的列（可重复执行），新增汇总列后需再执行 backfill-totals"""
+    created = create_missing_columns()
+    if created:
+        click.echo(f"已创建列: {', '.join(created)}")
+    else:
+        click.echo("列均已存在，无需创建")
+
+
+@click.command('create-indexes')
+@with_appcontext
+def create_indexes_command():
+    """补建热点查询所需的二级索引（可重复执行）"""
+    created = create_missing_indexes()
+    if created:
+        click.echo(f"已创建索引: {', '.join(created)}")
+    else:
+        click.echo("索引均已存在，无需创建")
+
+
+@click.command('create-tables')
+@with_appcontext
+def create_tables_command():
+    """创建模型中新增、库里还不存在的表（已有表不受影响）"""
+    import app.models  # noqa: F401
+    db.create_all()
+    click.echo("缺失的表已创建")
+
+
+@click.command('rebuild-supply-best')
+@with_appcontext
+def rebuild_supply_best_command():
+    """从 t_supply_info 全量重建最低供货价索引 t_supply_best"""
+    refresh_supply_best()
+    db.session.commit()
+    count = db.session.execute(text("SELECT COUNT(*) FROM t_supply_best")).scalar()
+    click.echo(f"已重建 {count} 个ISBN的最低供货价")
+
+
+@click.command('purge-tokens')
+@click.option('--batch-size', type=int, default=None, help='每批删除行数，默认取配置')
+@click.option('--batch-pause', type=float, default=None, help='批间暂停秒数，默认取配置')
+@with_appcontext
+def purge_tokens_command(batch_size, batch_pause):
+    """立即分批清理过期令牌"""
+    config = current_app.config
+    result = purge_expired_tokens(
+        batch_size=batch_size or config.get('TOKEN_REAPER_BATCH_SIZE', 500),
+        batch_pause=config.get('TOKEN_REAPER_BATCH_PAUSE', 0.2) if batch_pause is None else batch_pause,
+        max_batches=config.get('TOKEN_REAPER_MAX_BATCHES'),
+    )
+    click.echo(f"删除 {result['purged']} 行，共 {result['batches']} 批，耗时 {result['seconds']}s")
+
+
+@click.command('backfill-totals')
+@click.option('--table', type=click.Choice(sorted(TOTALS)), multiple=True, help='只处理指定的表，默认全部')
+@click.option('--batch-size', type=int, default=5000, help='每批单据数')
+@with_appcontext
+def backfill_totals_command(table, batch_size):
+    """按明细分批重算订单/退货单的 total_amount 与 line_count"""
+    for name in table or sorted(TOTALS):
+        click.echo(f"{name}: 已重算 {backfill_totals(name, batch_size)} 张单据")
+
+
+@click.command('check-totals')
+@click.option('--table', type=click.Choice(sorted(TOTALS)), multiple=True, help='只核对指定的表，默认全部')
+@click.option('--batch-size', type=int, default=5000, help='每批单据数')
+@click.option('--fix', is_flag=True, help='发现不一致时按明细修正')
+@with_appcontext
+def check_totals_command(table, batch_size, fix):
+    """核对订单/退货单的汇总列与明细是否一致，不一致时以非零状态退出"""
+    failed = False
+    for name in table or sorted(TOTALS):
+        checked, mismatched = check_totals(name, batch_size, fix=fix)
+        click.echo(f"{name}: 核对 {checked} 张单据，不一致 {len(mismatched)} 张" + ("（已修正）" if fix and mismatched else ""))
+        if mismatched:
+            click.echo(f"  例如: {', '.join(str(i) for i in mismatched[:20])}")
+            failed = failed or not fix
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command('archive-history')
+@click.option('--days', type=int, default=None, help='归档早于多少天所在月份的单据，默认取配置')
+@click.option('--batch-size', type=int, default=None, help='每批订单/进货单数，默认取配置')
+@click.option('--max-batches', type=int, default=None, help='本次最多执行的批数，默认不限')
+@with_appcontext
+def archive_history_command(days, batch_size, max_batches):
+    """把已结账期间的订单、退货和进货单分批移到归档表"""
+    config = current_app.config
+    days = config.get('ARCHIVE_AFTER_DAYS', 730) if days is None else days
+    if days < MIN_ARCHIVE_DAYS:
+        raise click.BadParameter(f"不能归档最近 {MIN_ARCHIVE_DAYS} 天内的单据", param_hint='--days')
+    result = archive_history(
+        archive_cutoff(days),
+        batch_size=batch_size or config.get('ARCHIVE_BATCH_SIZE', 1000),
+        batch_pause=config.get('ARCHIVE_BATCH_PAUSE', 0.2),
+        max_batches=max_batches,
+    )
+    click.echo(
+        f"归档 {result['cutoff']:%Y-%m-%d} 之前的单据：订单 {result['orders']}，退货 {result['returns']}，"
+        f"进货 {result['purchases']}，共 {result['batches']} 批，耗时 {result['seconds']}s"
+    )
+
+
+@click.command('snapshot-ranks')
+@click.option('--days', type=int, default=None, help='补建最近多少天内已结束的日/月排行快照，默认取配置')
+@with_appcontext
+def snapshot_ranks_command(days):
+    """夜间任务：为已结束、尚无快照的日和月生成排行快照"""
+    days = current_app.config.get('RANK_SNAPSHOT_DAYS', 35) if days is None else days
+    daily, monthly = build_snapshots(days)
+    click.echo(f"新建日榜快照 {daily} 个，月榜快照 {monthly} 个")
+
+
+@click.command('rollup-purchases')
+@click.option('--max-months', type=int, default=None, help='本次最多汇总的月份数，默认全部')
+@with_appcontext
+def rollup_purchases_command(max_months):
+    """夜间任务：把尚未汇总的已结束月份写入进货月度汇总表"""
+    months = build_rollup(max_months=max_months)
+    click.echo(f"已汇总 {months} 个月的进货")
+
+
+@click.command('clear-result-cache')
+@with_appcontext
+def clear_result_cache_command():
+    """直接改动数据库（绕过写接口）后清空共享结果缓存"""
+    if not result_cache.path:
+        click.echo("未配置 RESULT_CACHE_PATH，结果缓存未启用")
+        return
+    result_cache.clear()
+    click.echo("结果缓存已清空")
+
+
+def register_commands(app):
+    app.cli.add_command(create_columns_command)
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(create_tables_command)
+    app.cli.add_command(rebuild_supply_best_command)
+    app.cli.add_command(purge_tokens_command)
+    app.cli.add_command(backfill_totals_command)
+    app.cli.add_command(check_totals_command)
+    app.cli.add_command(archive_history_command)
+    app.cli.add_command(snapshot_ranks_command)
+    app.cli.add_command(clear_result_cache_command)
+    app.cli.add_command(rollup_purchases_command)
@@ -12,5 +12,172 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '123456')
     DB_NAME = os.getenv('DB_NAME', 'book_sales_db')
     SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # 存储后端：mysql，或 sqlite（嵌入式，单店终端 / 本地测试；视图与存储过程由 app/sqlite_backend.py 实现）。
+    # sqlite 时数据库文件为 SQLITE_PATH，SQLITE_AUTO_SCHEMA 为 true 时启动时自动建表、补列、重建视图；
+    # SQLITE_PRAGMAS 覆盖 app/sqlite_backend.py 中 PRAGMAS 的单项
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+    SQLITE_PATH = os.path.abspath(os.getenv('SQLITE_PATH', 'bsms.sqlite3'))
+    SQLITE_AUTO_SCHEMA = os.getenv('SQLITE_AUTO_SCHEMA', 'true').lower() == 'true'
+    SQLITE_PRAGMAS = {}
+    if DB_BACKEND == 'sqlite':
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{SQLITE_PATH}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True
\ No newline at end of file
+    SQLALCHEMY_ECHO = True
+
+    # 生产环境 pre-fork 运行参数（gunicorn.conf.py 读取）
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5000')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', str((os.cpu_count() or 1) * 2 + 1)))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '60'))
+    # 每个 worker 处理这么多请求后重启（加随机抖动避免同时重启），用于控制内存增长
+    WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', '5000'))
+    WEB_MAX_REQUESTS_JITTER = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '500'))
+
+    # 连接池按进程创建，大小与 worker 线程数匹配
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': WEB_THREADS,
+        'max_overflow': WEB_THREADS,
+        'pool_pre_ping': True,
+        'pool_recycle': 3600,
+    }
+
+    # 令牌认证（缓存容量、正向缓存 TTL 上限、无效令牌负缓存时长，单位秒）
+    AUTH_ENABLED = os.getenv('AUTH_ENABLED', 'true').lower() == 'true'
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '10000'))
+    AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '300'))
+    AUTH_NEGATIVE_TTL = int(os.getenv('AUTH_NEGATIVE_TTL', '30'))
+
+    # 过期令牌后台清理（运行间隔、每批行数、批间暂停，单位秒；MAX_BATCHES 为每轮上限，0 表示不限）
+    TOKEN_REAPER_ENABLED = os.getenv('TOKEN_REAPER_ENABLED', 'true').lower() == 'true'
+    TOKEN_REAPER_INTERVAL = int(os.getenv('TOKEN_REAPER_INTERVAL', '3600'))
+    TOKEN_REAPER_BATCH_SIZE = int(os.getenv('TOKEN_REAPER_BATCH_SIZE', '500'))
+    TOKEN_REAPER_BATCH_PAUSE = float(os.getenv('TOKEN_REAPER_BATCH_PAUSE', '0.2'))
+    TOKEN_REAPER_MAX_BATCHES = int(os.getenv('TOKEN_REAPER_MAX_BATCHES', '0')) or None
+
+    # 准入控制：统计接口与历史查询按接口限制并发，超出排队上限或等待超时直接返回 503。
+    # 这些接口与 /statistic/stream 推送连接合计最多占用 WEB_THREADS - ADMISSION_RESERVED_THREADS 个线程
+    # （含排队中的），剩余线程留给下单、采购、退货等写操作
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_CONCURRENCY = int(os.getenv('ADMISSION_CONCURRENCY', '2'))
+    ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '4'))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '2'))
+    ADMISSION_RESERVED_THREADS = int(os.getenv('ADMISSION_RESERVED_THREADS', '1'))
+    # 受控的非统计接口；统计蓝图下的接口全部受控
+    ADMISSION_ENDPOINTS = ['order.order_select', 'return.return_select', 'purchase.purchase_select']
+    # 统计蓝图下不按接口排队的接口：推送连接只占总量名额（被拒绝时 EventSource 不会自动重连）；
+    # 运行状态接口只读内存计数，过载时运维正需要查看，不受准入控制
+    ADMISSION_EXEMPT_ENDPOINTS = [
+        'statistic.stream',
+        'statistic.stream_stats',
+        'statistic.single_flight_stats',
+        'statistic.result_cache_stats',
+        'statistic.contention_stats',
+    ]
+    # 单独调整某个接口：{endpoint: (并发数, 排队上限)}
+    ADMISSION_LIMITS = {
+        'statistic.monthly_rank': (1, 4),
+        'statistic.reorder_plan': (1, 2),
+    }
+
+    # 相同参数的并发读请求合并为一次计算（follower 最长等待秒数，超时后自行执行）
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+    SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '30'))
+    SINGLE_FLIGHT_ENDPOINTS = [
+        'statistic.monthly_rank',
+        'statistic.daily_rank',
+        'statistic.stock_shortage',
+        'statistic.stock_select',
+    ]
+
+    # 请求采样：带 PROFILE_HEADER: 1 的请求（PROFILE_ROLES 中的角色）或按比例抽样的请求用 cProfile 采样，
+    # 超过慢请求阈值的请求自动记录 SQL 耗时；结果写入 PROFILE_DIR，只保留最新 PROFILE_MAX_FILES 份
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'true').lower() == 'true'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile')
+    PROFILE_ROLES = os.getenv('PROFILE_ROLES', 'admin').split(',')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_SLOW_THRESHOLD_MS = float(os.getenv('PROFILE_SLOW_THRESHOLD_MS', '1000'))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+
+    # Prometheus 指标（/metrics）；pre-fork 模式下各 worker 的指标文件目录由 gunicorn.conf.py
+    # 按环境变量 METRICS_MULTIPROC_DIR 设置
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # 令牌缓存、请求合并、结果缓存、锁冲突、准入拒绝等进程内计数及连接池状态的同步间隔（秒），由每个 worker 的后台线程执行
+    METRICS_SYNC_INTERVAL = float(os.getenv('METRICS_SYNC_INTERVAL', '1'))
+
+    # 历史单据归档（flask archive-history）：早于 ARCHIVE_AFTER_DAYS 天所在月份的订单、退货、进货移到归档表
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '730'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+    ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', '0.2'))
+
+    # 已结束日/月的排行快照（t_rank_snapshot）：首次请求或夜间任务 flask snapshot-ranks 写入，
+    # 命中快照的响应带 ETag 与 Cache-Control: no-cache（客户端每次用 If-None-Match 验证，未变时 304）；
+    # 迟到的退货删除原订单所在日/月的快照
+    RANK_SNAPSHOT_ENABLED = os.getenv('RANK_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    RANK_SNAPSHOT_DAYS = int(os.getenv('RANK_SNAPSHOT_DAYS', '35'))
+
+    # /statistic/stream 变更推送（SSE）：每个连接一个 EVENTS_BUFFER_SIZE 条的缓冲区，写满即断开；
+    # 每个 worker 最多 EVENTS_MAX_CLIENTS 个连接，连接 EVENTS_MAX_SECONDS 秒后由服务端结束、客户端自动重连。
+    # gthread 下每个连接占一个线程（空闲时阻塞在队列上，不耗 CPU、不占数据库连接），同时占一个准入总量名额，
+    # 默认最多占一半线程。看板成百上千时单独起一组只服务推送的实例（如 WEB_THREADS=256、EVENTS_MAX_CLIENTS=240），
+    # 反向代理把 /statistic/stream 转发过去，与写接口实例共用 EVENTS_RELAY_DIR，写接口实例的线程不受推送影响。
+    # gunicorn.conf.py 默认设置 EVENTS_RELAY_DIR，worker（及同机实例）之间经 Unix 套接字转发事件
+    EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', '100'))
+    EVENTS_MAX_CLIENTS = int(os.getenv('EVENTS_MAX_CLIENTS', str(max(1, WEB_THREADS // 2))))
+    EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+    EVENTS_MAX_SECONDS = float(os.getenv('EVENTS_MAX_SECONDS', '600'))
+    EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '3000'))
+    EVENTS_RELAY_DIR = os.getenv('EVENTS_RELAY_DIR') or None
+
+    # /batch 一次执行多个只读子请求：单次最多 BATCH_MAX_REQUESTS 个，parallel 时线程池大小为 BATCH_MAX_WORKERS
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
+    # 不能作为子请求的接口（批量接口本身、长连接推送、指标）
+    BATCH_EXCLUDED_ENDPOINTS = ['batch.batch', 'statistic.stream', 'metrics']
+
+    # 同机所有 worker 共用的读结果缓存（SQLite 文件，WAL 模式），未设置 RESULT_CACHE_PATH 时不启用；
+    # gunicorn.conf.py 默认设置。键为 接口 + 查询参数，条目最长保留 RESULT_CACHE_TTL 秒，
+    # 总大小超过 RESULT_CACHE_MAX_BYTES 时按最近访问时间淘汰
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH') or None
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '300'))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv('RESULT_CACHE_MAX_ENTRY_BYTES', str(4 * 1024 * 1024)))
+    # 缓存的接口 -> 结果依赖的表
+    RESULT_CACHE_ENDPOINTS = {
+        'statistic.stock_select': ['t_book', 't_stock'],
+        'statistic.stock_shortage': ['t_book', 't_stock', 't_order', 't_order_detail'],
+        'statistic.daily_rank': ['t_book', 't_order', 't_order_detail', 't_return', 't_return_detail'],
+        'statistic.monthly_rank': ['t_book', 't_order', 't_order_detail', 't_return', 't_return_detail'],
+        'basic.supply_info_select': ['t_supply_info', 't_supplier', 't_book'],
+        'statistic.purchase_summary_view': ['t_purchase', 't_supply_info', 't_supplier', 't_book'],
+    }
+    # 写接口 -> 写入的表（含级联删除的表）；写接口执行后作废依赖这些表的缓存
+    RESULT_CACHE_WRITES = {
+        'basic.book_insert': ['t_book', 't_stock'],
+        'basic.book_update': ['t_book', 't_stock'],
+        'basic.book_delete': ['t_book', 't_stock', 't_supply_info'],
+        'basic.book_import': ['t_book', 't_stock'],
+        'basic.book_bulk_delete': ['t_book', 't_stock', 't_supply_info'],
+        'basic.book_bulk_update': ['t_book', 't_stock'],
+        'basic.supplier_insert': ['t_supplier'],
+        'basic.supplier_update': ['t_supplier'],
+        'basic.supplier_delete': ['t_supplier', 't_supply_info'],
+        'basic.supply_info_insert': ['t_supply_info'],
+        'basic.supply_info_update': ['t_supply_info'],
+        'basic.supply_info_delete': ['t_supply_info'],
+        'basic.supply_info_bulk': ['t_supply_info'],
+        'purchase.purchase_insert': ['t_purchase', 't_stock'],
+        'order.order_insert': ['t_order', 't_order_detail'],
+        'return.return_insert': ['t_return', 't_return_detail', 't_stock'],
+    }
+
+    # 进货、退货存储过程遇到死锁（1213）或锁等待超时（1205）时整体重做事务，最多 DB_RETRY_ATTEMPTS 次；
+    # 第 n 次重试前随机等待 0 ~ min(DB_RETRY_MAX_DELAY, DB_RETRY_BASE_DELAY * 2^(n-1)) 秒
+    DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', '4'))
+    DB_RETRY_BASE_DELAY = float(os.getenv('DB_RETRY_BASE_DELAY', '0.05'))
+    DB_RETRY_MAX_DELAY = float(os.getenv('DB_RETRY_MAX_DELAY', '1.0'))
+
+    # /statistic/purchase/summary 的月度汇总（t_purchase_monthly）：落后不超过 PURCHASE_ROLLUP_CATCHUP_MONTHS 个月时
+    # 由请求顺带补齐，0 表示只由 flask rollup-purchases（夜间任务）维护
+    PURCHASE_ROLLUP_CATCHUP_MONTHS = int(os.getenv('PURCHASE_ROLLUP_CATCHUP_MONTHS', '2'))
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+
+from sqlalchemy.exc import DBAPIError
+
+from app.db import db
+
+# MySQL 锁冲突错误码：死锁时整个事务已被回滚，锁等待超时时只回滚了当前语句，两者都需重做整个事务
+DEADLOCK = 'deadlock'
+LOCK_TIMEOUT = 'lock_timeout'
+MYSQL_CODES = {1213: DEADLOCK, 1205: LOCK_TIMEOUT}
+
+
+class ContentionError(Exception):
+    """锁冲突重试次数用尽"""
+
+    def __init__(self, kind, attempts):
+        super().__init__(f"{kind}, {attempts} attempts")
+        self.kind = kind
+        self.attempts = attempts
+
+
+def contention_kind(error):
+    """锁冲突返回 DEADLOCK / LOCK_TIMEOUT，其它错误返回 None；SQLite 的 database is locked 按锁等待超时处理"""
+    if not isinstance(error, DBAPIError):
+        return None
+    orig = error.orig
+    code = orig.args[0] if getattr(orig, 'args', None) else None
+    if isinstance(code, int):
+        return MYSQL_CODES.get(code)
+    if 'database is locked' in str(orig):
+        return LOCK_TIMEOUT
+    return None
+
+
+class TransactionRetry:
+    """
+    遇到死锁、锁等待超时时回滚并重做整个事务（work + 提交），每次重试前按指数退避随机等待（full jitter），
+    避免冲突的几个请求同时重试再次冲突。按操作名统计尝试、重试、冲突与放弃次数。
+    """
+
+    def __init__(self):
+        self.attempts = 4
+        self.base_delay = 0.05
+        self.max_delay = 1.0
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.attempts = max(1, app.config.get('DB_RETRY_ATTEMPTS', 4))
+        self.base_delay = app.config.get('DB_RETRY_BASE_DELAY', 0.05)
+        self.max_delay = app.config.get('DB_RETRY_MAX_DELAY', 1.0)
+        with self._lock:
+            self.counters = {}
+
+    def _count(self, name, key):
+        with self._lock:
+            counter = self.counters.setdefault(name, {
+                "transactions": 0, "retries": 0, DEADLOCK: 0, LOCK_TIMEOUT: 0, "exhausted": 0,
+            })
+            counter[key] += 1
+
+    def run(self, name, work):
+        """执行 work() 并提交，返回 work 的结果；锁冲突重试用尽时抛出 ContentionError，其它错误回滚后原样抛出"""
+        self._count(name, 'transactions')
+        for attempt in range(1, self.attempts + 1):
+            try:
+                result = work()
+                db.session.commit()
+                return result
+            except Exception as e:
+                db.session.rollback()
+                kind = contention_kind(e)
+                if kind is None:
+                    raise
+                self._count(name, kind)
+                if attempt == self.attempts:
+                    self._count(name, 'exhausted')
+                    raise ContentionError(kind, attempt) from e
+            self._count(name, 'retries')
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counter) for name, counter in self.counters.items()}
+
+
+tx_retry = TransactionRetry()
+
+
+def contention_response(error):
+    """重试用尽时的响应：503 + Retry-After，提示稍后重新提交"""
+    reason = "死锁" if error.kind == DEADLOCK else "锁等待超时"
+    return {"code": 503, "msg": f"数据库繁忙（{reason}，已重试{error.attempts}次），请稍后重新提交"}, 503, {
+        "Retry-After": "1"
+    }
+
+
+def init_contention(app):
+    tx_retry.init_app(app)
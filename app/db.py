@@ -1,2 +1,25 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 db = SQLAlchemy()
+
+
+def in_read_snapshot():
+    """批量请求顺序执行时，子请求共用外层的只读事务（同一快照），其间不能提交"""
+    return has_app_context() and g.get('read_snapshot', False)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _forbid_commit_in_snapshot(session):
+    if in_read_snapshot():
+        raise RuntimeError("批量请求的只读快照内不能提交")
+
+
+def dispose_after_fork(app):
+    """
+    fork 之后在子进程中调用：丢弃从父进程继承的连接池而不关闭其中的连接
+    （连接仍属于父进程），子进程随后按需建立自己的连接。
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,230 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, text
+
+from app.db import db
+
+
+class Subscriber:
+    """一个 SSE 连接：有界缓冲区，写满即被断开，不拖慢发布方"""
+
+    def __init__(self, size, types=None):
+        self.queue = queue.Queue(size)
+        self.types = types
+        self.dropped = False
+
+    def offer(self, event):
+        """放入事件；缓冲区已满返回 False"""
+        if self.types and event['type'] not in self.types:
+            return True
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def drop(self):
+        """清空缓冲区并放入结束标记，消费方读到后关闭连接"""
+        self.dropped = True
+        with self.queue.mutex:
+            self.queue.queue.clear()
+        self.queue.put_nowait(None)
+
+
+class Relay:
+    """
+    pre-fork 多 worker 时在 worker 之间转发事件：每个 worker 在 EVENTS_RELAY_DIR 下绑定一个
+    Unix 数据报套接字，发布时向其它 worker 的套接字各发一份，对方缓冲区满时直接丢弃。
+    """
+
+    def __init__(self, directory, deliver):
+        self.directory = directory
+        self.deliver = deliver
+        self.pid = None
+        self.path = None
+        self.sender = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # fork 之后每个 worker 各自绑定，父进程的套接字不再使用
+        if self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.sock")
+            if os.path.exists(path):
+                os.remove(path)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sender.setblocking(False)
+            self.sender, self.path, self.pid = sender, path, os.getpid()
+            threading.Thread(target=self._receive, args=(receiver,), name='event-relay', daemon=True).start()
+
+    def _receive(self, receiver):
+        while True:
+            try:
+                data = receiver.recv(65536)
+            except OSError:
+                return
+            try:
+                self.deliver(json.loads(data))
+            except ValueError:
+                continue
+
+    def send(self, data):
+        self.ensure_started()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.sock') or path == self.path:
+                continue
+            try:
+                self.sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # worker 已退出，清理遗留的套接字文件
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                # 对方接收缓冲区已满（BlockingIOError）等，丢弃这一份
+                pass
+
+
+class Broker:
+    """
+    进程内事件分发：每个订阅者一个有界队列，发布时逐个非阻塞放入，放不下的订阅者被断开。
+    空闲连接只是一个阻塞在队列上的线程，没有轮询和数据库查询。
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.buffer_size = 100
+        self.max_clients = 100
+        self.relay = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.buffer_size = config.get('EVENTS_BUFFER_SIZE', 100)
+        self.max_clients = config.get('EVENTS_MAX_CLIENTS', 100)
+        relay_dir = config.get('EVENTS_RELAY_DIR')
+        self.relay = Relay(relay_dir, self.deliver) if relay_dir else None
+
+    def subscribe(self, types=None):
+        """新建订阅；已达 EVENTS_MAX_CLIENTS 时返回 None"""
+        if self.relay is not None:
+            self.relay.ensure_started()
+        with self._lock:
+            if len(self.subscribers) >= self.max_clients:
+                return None
+            subscriber = Subscriber(self.buffer_size, types)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def deliver(self, event):
+        """投递给本进程的订阅者"""
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber.offer(event):
+                self.delivered += 1
+                continue
+            self.unsubscribe(subscriber)
+            subscriber.drop()
+            self.dropped += 1
+
+    def publish(self, event_type, data):
+        event = {"type": event_type, "time": datetime.now().isoformat(), "data": data}
+        self.published += 1
+        self.deliver(event)
+        if self.relay is not None:
+            self.relay.send(json.dumps(event, ensure_ascii=False, default=str).encode('utf-8'))
+
+    def stats(self):
+        return {
+            "clients": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+broker = Broker()
+
+
+def publish(event_type, data):
+    """写接口提交后调用；推送失败只记日志，不影响写接口的结果"""
+    try:
+        broker.publish(event_type, data)
+    except Exception as e:
+        current_app.logger.warning(f"事件推送失败: {e}")
+
+
+def publish_stock(isbns):
+    """推送这些图书提交后的最新库存"""
+    isbns = sorted(set(isbns))
+    if not isbns:
+        return
+    try:
+        rows = db.session.execute(
+            text("SELECT isbn, quantity FROM t_stock WHERE isbn IN :isbns").bindparams(
+                bindparam('isbns', expanding=True)
+            ),
+            {"isbns": isbns}
+        ).fetchall()
+    except Exception as e:
+        current_app.logger.warning(f"库存事件查询失败: {e}")
+        return
+    publish('stock', [{"isbn": isbn, "quantity": quantity} for isbn, quantity in rows])
+
+
+def format_event(event):
+    """SSE 报文：event 为事件类型，data 为单行 JSON"""
+    payload = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+def iter_stream(subscriber, heartbeat=15, max_seconds=600, retry_ms=3000):
+    """
+    SSE 响应体：空闲时每 heartbeat 秒发一次注释行（顺便发现已断开的客户端），
+    max_seconds 后结束让客户端按 retry 重连；被判定为慢消费者时发送 dropped 事件后结束。
+    """
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {retry_ms}\n: connected\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = subscriber.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                yield "event: dropped\ndata: {}\n\n"
+                return
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def init_events(app):
+    broker.init_app(app)
@@ -0,0 +1,173 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+from app.db import db
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl；开发服务器只有一个进程，不需要文件租约
+    fcntl = None
+
+
+def purge_expired_tokens(batch_size=500, batch_pause=0.2, max_batches=None, stop_event=None):
+    """
+    分批删除过期令牌：每批先按 expire_time 取一小批主键再按主键删除并立即提交，
+    批间暂停以缩短锁持有时间。返回 {"purged", "batches", "seconds"}。
+    """
+    started = time.perf_counter()
+    cutoff = datetime.now()
+    purged = 0
+    batches = 0
+    delete_stmt = text("DELETE FROM t_token WHERE token_id IN :ids").bindparams(
+        bindparam('ids', expanding=True)
+    )
+
+    while max_batches is None or batches < max_batches:
+        if stop_event is not None and stop_event.is_set():
+            break
+        ids = [r[0] for r in db.session.execute(
+            text("SELECT token_id FROM t_token WHERE expire_time < :cutoff LIMIT :n"),
+            {"cutoff": cutoff, "n": batch_size}
+        )]
+        if not ids:
+            db.session.rollback()
+            break
+        result = db.session.execute(delete_stmt, {"ids": ids})
+        db.session.commit()
+        purged += result.rowcount
+        batches += 1
+        if len(ids) < batch_size:
+            break
+        if batch_pause:
+            time.sleep(batch_pause)
+
+    return {"purged": purged, "batches": batches, "seconds": round(time.perf_counter() - started, 3)}
+
+
+class ProcessLease:
+    """
+    部署内只允许一个进程执行的后台任务的租约：MySQL 用 GET_LOCK 并一直占用一个连接，
+    嵌入式 SQLite 用库文件旁的文件锁（仅 POSIX；Windows 上只有开发服务器单进程运行，直接视为持有）。持有者进程退出（连接断开 / 文件关闭）后租约自动释放，
+    其它进程下次 acquire 时接手。
+    """
+
+    def __init__(self, name):
+        self.name = f"bsms_{name}"
+        self._holder = None
+
+    def _acquire_mysql(self):
+        if self._holder is not None:
+            try:
+                owned = self._holder.execute(
+                    text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"), {"name": self.name}
+                ).scalar()
+                self._holder.commit()
+                if owned:
+                    return True
+            except Exception:
+                pass
+            self.release()
+        conn = db.engine.connect()
+        if conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}).scalar() == 1:
+            conn.commit()
+            self._holder = conn
+            return True
+        conn.close()
+        return False
+
+    def _acquire_file(self):
+        if self._holder is not None or fcntl is None:
+            return True
+        lock_file = open(f"{db.engine.url.database}.{self.name}.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._holder = lock_file
+        return True
+
+    def acquire(self):
+        """本进程持有（或刚取得）租约时返回 True，已被其它进程持有时返回 False"""
+        if db.engine.dialect.name == 'sqlite':
+            return self._acquire_file()
+        return self._acquire_mysql()
+
+    def release(self):
+        holder, self._holder = self._holder, None
+        if holder is not None:
+            try:
+                holder.close()
+            except Exception:
+                pass
+
+
+class TokenReaper(threading.Thread):
+    """后台线程：按固定间隔清理过期令牌"""
+
+    def __init__(self, app):
+        super().__init__(name='token-reaper', daemon=True)
+        self.app = app
+        self.interval = app.config.get('TOKEN_REAPER_INTERVAL', 3600)
+        self.batch_size = app.config.get('TOKEN_REAPER_BATCH_SIZE', 500)
+        self.batch_pause = app.config.get('TOKEN_REAPER_BATCH_PAUSE', 0.2)
+        self.max_batches = app.config.get('TOKEN_REAPER_MAX_BATCHES')
+        self.last_result = None
+        self.lease = ProcessLease('token_reaper')
+        self._stop_event = threading.Event()
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                if not self.lease.acquire():
+                    # 清理由持有租约的其它 worker 执行
+                    return None
+                self.last_result = purge_expired_tokens(
+                    batch_size=self.batch_size,
+                    batch_pause=self.batch_pause,
+                    max_batches=self.max_batches,
+                    stop_event=self._stop_event,
+                )
+                self.app.logger.info(
+                    "过期令牌清理完成: 删除 %(purged)s 行, %(batches)s 批, 耗时 %(seconds)ss", self.last_result
+                )
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning(f"过期令牌清理失败: {e}")
+            finally:
+                db.session.remove()
+        return self.last_result
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.run_once()
+
+    def stop(self):
+        self._stop_event.set()
+        self.lease.release()
+
+
+def init_maintenance(app):
+    """
+    按配置注册后台维护任务。线程在进程处理第一个请求时才启动：
+    pre-fork 模式下 master 预加载应用后不会带着线程 fork，每个 worker 各自启动，
+    但只有取得 ProcessLease 的一个进程真正执行清理，其余 worker 每个间隔尝试接手一次。
+    """
+    if not app.config.get('TOKEN_REAPER_ENABLED'):
+        return
+    lock = threading.Lock()
+
+    def start_reaper():
+        if 'token_reaper' in app.extensions:
+            return
+        with lock:
+            if 'token_reaper' not in app.extensions:
+                reaper = TokenReaper(app)
+                reaper.start()
+                app.extensions['token_reaper'] = reaper
+
+    app.before_request(start_reaper)
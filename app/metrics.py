@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+from flask import Response, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+from app.admission import admission
+from app.auth import public, token_cache
+from app.db import db
+from app.contention import DEADLOCK, LOCK_TIMEOUT, tx_retry
+from app.result_cache import result_cache
+from app.single_flight import single_flight
+
+# pre-fork 模式下由 gunicorn.conf.py 设置 PROMETHEUS_MULTIPROC_DIR，各 worker 把指标写入该目录下的
+# mmap 文件，/metrics 汇总全部 worker；未设置时（开发服务器）只统计当前进程
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUESTS = Counter(
+    'bsms_http_requests_total', '请求数', ['endpoint', 'method', 'status']
+)
+LATENCY = Histogram(
+    'bsms_http_request_duration_seconds', '请求耗时', ['endpoint'], buckets=LATENCY_BUCKETS
+)
+DB_TIME = Histogram(
+    'bsms_db_time_seconds', '单个请求内 SQL 执行总耗时', ['endpoint'], buckets=LATENCY_BUCKETS
+)
+DB_QUERIES = Counter(
+    'bsms_db_queries_total', 'SQL 语句数', ['endpoint']
+)
+POOL_SIZE = Gauge(
+    'bsms_db_pool_size', '连接池容量', multiprocess_mode='livesum'
+)
+POOL_CHECKED_OUT = Gauge(
+    'bsms_db_pool_checked_out', '已借出的连接数', multiprocess_mode='livesum'
+)
+POOL_OVERFLOW = Gauge(
+    'bsms_db_pool_overflow', '超出容量临时创建的连接数', multiprocess_mode='livesum'
+)
+CACHE_HITS = Counter(
+    'bsms_cache_hits_total', '缓存命中数', ['cache']
+)
+CACHE_MISSES = Counter(
+    'bsms_cache_misses_total', '缓存未命中数', ['cache']
+)
+ADMISSION_REJECTED = Counter(
+    'bsms_admission_rejected_total', '准入控制拒绝数（含排队超时）', ['endpoint']
+)
+DB_CONTENTION = Counter(
+    'bsms_db_contention_total', '事务遇到的锁冲突次数', ['operation', 'kind']
+)
+DB_RETRIES = Counter(
+    'bsms_db_retries_total', '锁冲突后重做事务的次数', ['operation']
+)
+DB_RETRIES_EXHAUSTED = Counter(
+    'bsms_db_retries_exhausted_total', '锁冲突重试用尽而失败的事务数', ['operation']
+)
+
+
+class _Synced:
+    """把各模块进程内的累计计数按增量同步到 Prometheus 计数器，记录路径上不改动这些模块"""
+
+    def __init__(self):
+        self.last = {}
+        self._lock = threading.Lock()
+
+    def inc(self, counter, labels, value):
+        key = (id(counter), labels)
+        with self._lock:
+            delta = value - self.last.get(key, 0)
+            self.last[key] = value
+        if delta > 0:
+            counter.labels(*labels).inc(delta)
+
+
+_synced = _Synced()
+
+
+def _sync_process_stats():
+    _synced.inc(CACHE_HITS, ('token',), token_cache.hits)
+    _synced.inc(CACHE_MISSES, ('token',), token_cache.misses)
+    # 请求合并：复用结果的请求计为命中，实际执行的请求计为未命中
+    counters = list(single_flight.counters.values())
+    _synced.inc(CACHE_HITS, ('single_flight',), sum(c['coalesced'] for c in counters))
+    _synced.inc(CACHE_MISSES, ('single_flight',), sum(c['leaders'] + c['fallbacks'] for c in counters))
+    _synced.inc(CACHE_HITS, ('result',), result_cache.hits)
+    _synced.inc(CACHE_MISSES, ('result',), result_cache.misses)
+    for operation, counter in tx_retry.stats().items():
+        for kind in (DEADLOCK, LOCK_TIMEOUT):
+            _synced.inc(DB_CONTENTION, (operation, kind), counter[kind])
+        _synced.inc(DB_RETRIES, (operation,), counter['retries'])
+        _synced.inc(DB_RETRIES_EXHAUSTED, (operation,), counter['exhausted'])
+    for endpoint, limiter in list(admission.limiters.items()):
+        _synced.inc(ADMISSION_REJECTED, (endpoint,), limiter.rejected + limiter.timeouts)
+
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        POOL_SIZE.set(pool.size())
+        POOL_CHECKED_OUT.set(pool.checkedout())
+        POOL_OVERFLOW.set(max(0, pool.overflow()))
+
+
+class _SyncThread(threading.Thread):
+    """每个 worker 一个后台线程，按 METRICS_SYNC_INTERVAL 秒同步进程内计数与连接池状态，请求路径上不做同步"""
+
+    def __init__(self, app, interval):
+        super().__init__(name='metrics-sync', daemon=True)
+        self.app = app
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    _sync_process_stats()
+            except Exception as e:
+                self.app.logger.warning(f"指标同步失败: {e}")
+
+
+_sync_pid = None
+_sync_lock = threading.Lock()
+
+
+def _ensure_sync_thread(app):
+    """fork 之后线程不会被继承，按进程号在每个 worker 的首个请求时启动"""
+    global _sync_pid
+    if _sync_pid == os.getpid():
+        return
+    with _sync_lock:
+        if _sync_pid != os.getpid():
+            _SyncThread(app, app.config.get('METRICS_SYNC_INTERVAL', 1.0)).start()
+            _sync_pid = os.getpid()
+
+
+def record_request(response):
+    """after_request：记录请求数、耗时和 SQL 耗时（每个请求只做几次计数器更新）"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+    timings = g.get('sql_timings')
+    if timings is not None and timings.count:
+        DB_TIME.labels(endpoint).observe(timings.seconds)
+        DB_QUERIES.labels(endpoint).inc(timings.count)
+    _ensure_sync_thread(current_app._get_current_object())
+    return response
+
+
+@public
+def metrics():
+    """Prometheus 文本格式指标，多进程模式下汇总所有 worker"""
+    _sync_process_stats()
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -38,6 +38,11 @@ class User(db.Model):
 # 用户令牌表
 class Token(db.Model):
     __tablename__ = 't_token'
+    __table_args__ = (
+        db.Index('idx_token_token', 'token'),
+        # 过期令牌分批清理
+        db.Index('idx_token_expire_time', 'expire_time'),
+    )
 
     token_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True, comment='令牌ID')
     user_id = db.Column(db.Integer, db.ForeignKey('t_user.user_id', ondelete='CASCADE'), nullable=False,
@@ -100,6 +105,10 @@ class Supplier(db.Model):
 # 供货报价表
 class SupplyInfo(db.Model):
     __tablename__ = 't_supply_info'
+    __table_args__ = (
+        # 主键以 supplier_id 开头，按图书取最低报价需要单独的索引
+        db.Index('idx_supply_info_isbn_price', 'isbn', 'supply_price'),
+    )
 
     supplier_id = db.Column(db.Integer, db.ForeignKey('t_supplier.supplier_id'), primary_key=True, comment='供应商编号')
     isbn = db.Column(db.String(13), db.ForeignKey('t_book.isbn'), primary_key=True, comment='图书ISBN')
@@ -109,9 +118,30 @@ class SupplyInfo(db.Model):
         return f'<SupplyInfo {self.supplier_id}-{self.isbn}: ¥{self.supply_price}>'
 
 
+# 最低供货价索引表（由供货报价写接口维护，每个ISBN保存最低价与次低价报价）
+class SupplyBest(db.Model):
+    __tablename__ = 't_supply_best'
+
+    isbn = db.Column(db.String(13), db.ForeignKey('t_book.isbn', ondelete='CASCADE'), primary_key=True,
+                     comment='图书ISBN')
+    best_supplier_id = db.Column(db.Integer, nullable=False, comment='最低价供应商编号')
+    best_price = db.Column(db.Numeric(8, 2), nullable=False, comment='最低供货价')
+    second_supplier_id = db.Column(db.Integer, nullable=True, comment='次低价供应商编号')
+    second_price = db.Column(db.Numeric(8, 2), nullable=True, comment='次低供货价')
+
+    def __repr__(self):
+        return f'<SupplyBest {self.isbn}: {self.best_supplier_id} ¥{self.best_price}>'
+
+
 # 进货记录表
 class Purchase(db.Model):
     __tablename__ = 't_purchase'
+    __table_args__ = (
+        # 按图书查最近进货记录
+        db.Index('idx_purchase_isbn_time', 'isbn', 'purchase_time'),
+        # 进货记录按时间倒序、按时间范围归档
+        db.Index('idx_purchase_time', 'purchase_time'),
+    )
 
     purchase_id = db.Column(db.BigInteger, primary_key=True, comment='进货单号')
     supplier_id = db.Column(db.Integer, db.ForeignKey('t_supplier.supplier_id'), nullable=False, comment='供应商编号')
@@ -128,10 +158,17 @@ class Purchase(db.Model):
 # 销售订单表
 class Order(db.Model):
     __tablename__ = 't_order'
+    __table_args__ = (
+        # 日榜/月榜、库存预警按销售时间范围过滤，销售记录按时间倒序
+        db.Index('idx_order_time', 'order_time'),
+    )
 
     order_id = db.Column(db.BigInteger, primary_key=True, comment='订单编号')
     order_time = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='销售时间')
     user_id = db.Column(db.Integer, db.ForeignKey('t_user.user_id'), nullable=False, comment='经手人ID')
+    # 冗余汇总列，由写入接口在同一事务内维护（flask backfill-totals / check-totals 补算与核对）
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default='0', comment='订单金额')
+    line_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='明细行数')
 
     # 关联关系
     order_details = db.relationship('OrderDetail', backref='order', lazy=True, cascade='all, delete-orphan')
@@ -144,6 +181,10 @@ class Order(db.Model):
 # 销售明细表
 class OrderDetail(db.Model):
     __tablename__ = 't_order_detail'
+    __table_args__ = (
+        # 主键 (order_id, isbn) 无法支持按图书汇总销量
+        db.Index('idx_order_detail_isbn', 'isbn'),
+    )
 
     order_id = db.Column(db.BigInteger, db.ForeignKey('t_order.order_id'), primary_key=True, comment='订单编号')
     isbn = db.Column(db.String(13), db.ForeignKey('t_book.isbn'), primary_key=True, comment='图书ISBN')
@@ -157,12 +198,20 @@ class OrderDetail(db.Model):
 # 退货订单表
 class Return(db.Model):
     __tablename__ = 't_return'
+    __table_args__ = (
+        db.Index('idx_return_time', 'return_time'),
+        # 退货校验按原订单汇总已退数量
+        db.Index('idx_return_order_id', 'order_id'),
+    )
 
     return_id = db.Column(db.BigInteger, primary_key=True, comment='退货单号')
     order_id = db.Column(db.BigInteger, db.ForeignKey('t_order.order_id'), nullable=False, comment='原订单编号')
     reason = db.Column(db.String(255), nullable=True, comment='退货原因')
     return_time = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='退货时间')
     user_id = db.Column(db.Integer, db.ForeignKey('t_user.user_id'), nullable=False, comment='处理人ID')
+    # 冗余汇总列（退货金额按原订单成交价计算），由退货接口在同一事务内维护
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default='0', comment='退货金额')
+    line_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='明细行数')
 
     # 关联关系
     return_details = db.relationship('ReturnDetail', backref='return_order', lazy=True, cascade='all, delete-orphan')
@@ -180,4 +229,125 @@ class ReturnDetail(db.Model):
     return_qty = db.Column(db.Integer, nullable=False, comment='退货数量')
 
     def __repr__(self):
-        return f'<ReturnDetail Return:{self.return_id}, Book:{self.isbn}>'
\ No newline at end of file
+        return f'<ReturnDetail Return:{self.return_id}, Book:{self.isbn}>'
+
+
+# ========== 归档表（flask archive-history 把已结账期间的历史单据移到这里，无外键约束） ==========
+
+# 归档进度：table_name 之前的单据可能已在归档表中
+class ArchiveState(db.Model):
+    __tablename__ = 't_archive_state'
+
+    table_name = db.Column(db.String(64), primary_key=True, comment='热表名')
+    archived_before = db.Column(db.DateTime, nullable=False, comment='早于该时间的单据可能已归档')
+
+    def __repr__(self):
+        return f'<ArchiveState {self.table_name} < {self.archived_before}>'
+
+
+class OrderArchive(db.Model):
+    __tablename__ = 't_order_archive'
+    __table_args__ = (
+        db.Index('idx_order_archive_time', 'order_time'),
+    )
+
+    order_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False, comment='订单编号')
+    order_time = db.Column(db.DateTime, nullable=False, comment='销售时间')
+    user_id = db.Column(db.Integer, nullable=False, comment='经手人ID')
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, server_default='0', comment='订单金额')
+    line_count = db.Column(db.Integer, nullable=False, server_default='0', comment='明细行数')
+
+
+class OrderDetailArchive(db.Model):
+    __tablename__ = 't_order_detail_archive'
+    __table_args__ = (
+        db.Index('idx_order_detail_archive_isbn', 'isbn'),
+    )
+
+    order_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False, comment='订单编号')
+    isbn = db.Column(db.String(13), primary_key=True, comment='图书ISBN')
+    order_qty = db.Column(db.Integer, nullable=False, comment='购买数量')
+    order_price = db.Column(db.Numeric(8, 2), nullable=False, comment='成交单价')
+
+
+class ReturnArchive(db.Model):
+    __tablename__ = 't_return_archive'
+    __table_args__ = (
+        db.Index('idx_return_archive_time', 'return_time'),
+        db.Index('idx_return_archive_order_id', 'order_id'),
+    )
+
+    return_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False, comment='退货单号')
+    order_id = db.Column(db.BigInteger, nullable=False, comment='原订单编号')
+    reason = db.Column(db.String(255), nullable=True, comment='退货原因')
+    return_time = db.Column(db.DateTime, nullable=False, comment='退货时间')
+    user_id = db.Column(db.Integer, nullable=False, comment='处理人ID')
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, server_default='0', comment='退货金额')
+    line_count = db.Column(db.Integer, nullable=False, server_default='0', comment='明细行数')
+
+
+class ReturnDetailArchive(db.Model):
+    __tablename__ = 't_return_detail_archive'
+    __table_args__ = (
+        # 删除图书前检查是否仍被归档退货引用
+        db.Index('idx_return_detail_archive_isbn', 'isbn'),
+    )
+
+    return_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False, comment='退货单号')
+    isbn = db.Column(db.String(13), primary_key=True, comment='图书ISBN')
+    return_qty = db.Column(db.Integer, nullable=False, comment='退货数量')
+
+
+class PurchaseArchive(db.Model):
+    __tablename__ = 't_purchase_archive'
+    __table_args__ = (
+        db.Index('idx_purchase_archive_time', 'purchase_time'),
+        db.Index('idx_purchase_archive_isbn_time', 'isbn', 'purchase_time'),
+    )
+
+    purchase_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False, comment='进货单号')
+    supplier_id = db.Column(db.Integer, nullable=False, comment='供应商编号')
+    isbn = db.Column(db.String(13), nullable=False, comment='图书ISBN')
+    purchase_qty = db.Column(db.Integer, nullable=False, comment='进货数量')
+    purchase_price = db.Column(db.Numeric(8, 2), nullable=False, comment='进货单价')
+    purchase_time = db.Column(db.DateTime, nullable=False, comment='进货时间')
+    user_id = db.Column(db.Integer, nullable=False, comment='经手人ID')
+
+
+# 已结束日/月的销售排行快照：首次计算或夜间任务写入，迟到的退货会删除受影响的快照
+class RankSnapshot(db.Model):
+    __tablename__ = 't_rank_snapshot'
+
+    period_type = db.Column(db.String(16), primary_key=True, comment='daily / monthly')
+    period = db.Column(db.String(10), primary_key=True, comment='YYYY-MM-DD 或 YYYY-MM')
+    payload = db.Column(db.Text(length=2 ** 24), nullable=False, comment='完整排行（JSON，未排序未截断）')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment='生成时间')
+
+    def __repr__(self):
+        return f'<RankSnapshot {self.period_type} {self.period}>'
+
+
+# 进货月度汇总：只含已结束的月份（进货时间取 NOW()，结束的月份不会再有新进货），由 purchase_rollup 维护
+class PurchaseMonthly(db.Model):
+    __tablename__ = 't_purchase_monthly'
+
+    month = db.Column(db.String(7), primary_key=True, comment='YYYY-MM')
+    supplier_id = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='供应商编号')
+    isbn = db.Column(db.String(13), primary_key=True, comment='图书ISBN')
+    purchase_qty = db.Column(db.Integer, nullable=False, comment='进货数量')
+    spend = db.Column(db.Numeric(14, 2), nullable=False, comment='进货金额')
+    purchase_count = db.Column(db.Integer, nullable=False, comment='进货单数')
+
+    def __repr__(self):
+        return f'<PurchaseMonthly {self.month} {self.supplier_id} {self.isbn}>'
+
+
+# 月度汇总进度：rolled_up_before 之前的月份都已汇总
+class RollupState(db.Model):
+    __tablename__ = 't_rollup_state'
+
+    table_name = db.Column(db.String(64), primary_key=True, comment='汇总表名')
+    rolled_up_before = db.Column(db.DateTime, nullable=False, comment='早于该时间的月份已汇总')
+
+    def __repr__(self):
+        return f'<RollupState {self.table_name} < {self.rolled_up_before}>'
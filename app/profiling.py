@@ -0,0 +1,198 @@
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from app.db import db
+
+
+class SqlTimings:
+    """单个请求的 SQL 耗时，按语句文本聚合，内存只与不同语句的数量有关"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def merge(self, other):
+        """并入另一段 SQL 耗时（批量请求把子请求的计入外层请求）"""
+        self.count += other.count
+        self.seconds += other.seconds
+        for statement, (count, total, worst) in other.statements.items():
+            entry = self.statements.setdefault(statement, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], worst)
+
+    def report(self):
+        rows = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "count": self.count,
+            "total_ms": round(self.seconds * 1000, 3),
+            "statements": [
+                {
+                    "sql": " ".join(statement.split()),
+                    "count": count,
+                    "total_ms": round(total * 1000, 3),
+                    "max_ms": round(worst * 1000, 3),
+                }
+                for statement, (count, total, worst) in rows
+            ],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is not None and has_request_context():
+        timings = g.get('sql_timings')
+        if timings is not None:
+            timings.add(statement, time.perf_counter() - started)
+
+
+def _wants_profile():
+    config = current_app.config
+    header = request.headers.get(config.get('PROFILE_HEADER', 'X-Profile'), '')
+    if header.lower() in ('1', 'true', 'yes'):
+        user = g.get('current_user')
+        if user and user['role_name'] in config.get('PROFILE_ROLES', []):
+            return True
+        if not config.get('AUTH_ENABLED', True):
+            return True
+    rate = config.get('PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def begin_request():
+    """before_request（最先执行）：记录开始时间并开始收集 SQL 耗时，供采样与指标使用"""
+    g.request_started = time.perf_counter()
+    g.sql_timings = SqlTimings()
+
+
+def start_request():
+    """before_request：命中请求头或抽样时启动 cProfile"""
+    g.profiler = None
+    if _wants_profile():
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 同一线程已有其它 profiler 在运行
+            return None
+        g.profiler = profiler
+    return None
+
+
+def _rotate(directory, max_files):
+    """只保留最新的 max_files 组采样文件"""
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:max(0, len(names) - max_files)]:
+        stem = name[:-len('.json')]
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+_write_lock = threading.Lock()
+
+
+def _write_capture(profiler, elapsed_ms, reason, response):
+    config = current_app.config
+    directory = config.get('PROFILE_DIR', 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    endpoint = request.endpoint or 'unknown'
+    stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{os.getpid()}_{endpoint}_{int(elapsed_ms)}ms"
+
+    report = {
+        "endpoint": endpoint,
+        "method": request.method,
+        "path": request.path,
+        "query_string": request.query_string.decode('utf-8', 'replace'),
+        "status": response.status_code,
+        "elapsed_ms": round(elapsed_ms, 3),
+        "reason": reason,
+        "pid": os.getpid(),
+        "user_id": (g.get('current_user') or {}).get('user_id'),
+        "profile": stem + '.prof' if profiler is not None else None,
+        "sql": g.sql_timings.report(),
+    }
+    with _write_lock:
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(directory, stem + '.prof'))
+        with open(os.path.join(directory, stem + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        _rotate(directory, config.get('PROFILE_MAX_FILES', 200))
+    return stem
+
+
+def finish_request(response):
+    """after_request：写出被采样或超过慢请求阈值的请求（cProfile 结果 + SQL 耗时）"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    threshold = current_app.config.get('PROFILE_SLOW_THRESHOLD_MS', 0)
+    if profiler is not None:
+        reason = 'profile'
+    elif threshold and elapsed_ms >= threshold:
+        reason = 'slow'
+    else:
+        return response
+
+    try:
+        stem = _write_capture(profiler, elapsed_ms, reason, response)
+        response.headers['X-Profile-Id'] = stem
+    except Exception as e:
+        current_app.logger.warning(f"请求采样写出失败: {e}")
+    return response
+
+
+def stop_profiler(exc=None):
+    # 视图抛出未处理异常时 after_request 不执行，确保 profiler 被关闭
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+def init_request_timing(app):
+    """注册请求计时与 SQL 耗时收集，需在其它 before_request 之前注册"""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(begin_request)
+
+
+def init_profiling(app):
+    if not app.config.get('PROFILE_ENABLED', True):
+        return
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(stop_profiler)
@@ -0,0 +1,30 @@
+def parse_fields(args, allowed):
+    """
+    解析 fields 参数（逗号分隔），返回按 allowed 顺序排列的字段列表；未给出时返回全部字段。
+    含 allowed 以外的字段时抛出 ValueError。
+    """
+    raw = args.get('fields', '')
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    if not requested:
+        return list(allowed)
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise ValueError(f"不支持的字段 {', '.join(unknown)}，可选: {', '.join(allowed)}")
+    return [name for name in allowed if name in requested]
+
+
+def parse_flag(args, name, default=True):
+    """解析 true/false 开关参数，取值非法时抛出 ValueError"""
+    raw = (args.get(name) or '').strip().lower()
+    if not raw:
+        return default
+    if raw in ('1', 'true', 'yes'):
+        return True
+    if raw in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"{name}参数只能是true或false")
+
+
+def select_list(columns, fields):
+    """columns 为 {字段: SQL 表达式}，返回 fields 对应的 SELECT 列清单"""
+    return ", ".join(f"{columns[name]} AS {name}" for name in fields)
@@ -0,0 +1,246 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.archive import purchase_sources
+from app.db import db
+from app.ranking import MONTHLY, period_end
+
+ROLLUP = 't_purchase_monthly'
+
+# group_by -> (汇总键列, 补充名称的连接, 名称列)
+GROUPS = {
+    'supplier': ('supplier_id', "LEFT JOIN t_supplier sp ON sp.supplier_id = a.supplier_id", "sp.supplier_name"),
+    'isbn': ('isbn', "LEFT JOIN t_book b ON b.isbn = a.isbn", "b.title"),
+    'month': ('month', "", None),
+}
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return period_end(MONTHLY, start)
+
+
+def month_ceil(moment):
+    """moment 所在月份的第一天；moment 不在月初时取下个月第一天"""
+    start = month_start(moment)
+    return start if start == moment else next_month(start)
+
+
+def _month_expr(column):
+    if db.engine.dialect.name == 'sqlite':
+        return f"strftime('%Y-%m', {column})"
+    return f"DATE_FORMAT({column}, '%Y-%m')"
+
+
+def rolled_up_before():
+    """早于该时间的月份都已汇总；从未汇总时返回 None"""
+    return db.session.execute(
+        text("SELECT rolled_up_before FROM t_rollup_state WHERE table_name = :name"), {"name": ROLLUP}
+    ).scalar()
+
+
+def _set_watermark(moment):
+    updated = db.session.execute(
+        text("UPDATE t_rollup_state SET rolled_up_before = :moment WHERE table_name = :name"),
+        {"name": ROLLUP, "moment": moment}
+    ).rowcount
+    if not updated:
+        db.session.execute(
+            text("INSERT INTO t_rollup_state (table_name, rolled_up_before) VALUES (:name, :moment)"),
+            {"name": ROLLUP, "moment": moment}
+        )
+
+
+def _first_purchase_month():
+    """最早一张进货单（含归档表）所在月份；没有进货单时返回 None"""
+    earliest = None
+    for table in purchase_sources(datetime.min):
+        value = db.session.execute(
+            text(f"SELECT purchase_time FROM {table} ORDER BY purchase_time LIMIT 1")
+        ).scalar()
+        if value is not None and (earliest is None or value < earliest):
+            earliest = value
+    return month_start(earliest) if earliest else None
+
+
+def _build_month(start):
+    """重算一个月的汇总行（先删后插，可重复执行），在调用方的事务内执行"""
+    end = next_month(start)
+    month = start.strftime('%Y-%m')
+    sources = " UNION ALL ".join(
+        f"""SELECT supplier_id, isbn, purchase_qty, purchase_price
+            FROM {table}
+            WHERE purchase_time >= :start AND purchase_time < :end"""
+        for table in purchase_sources(start)
+    )
+    db.session.execute(text(f"DELETE FROM {ROLLUP} WHERE month = :month"), {"month": month})
+    db.session.execute(text(f"""
+        INSERT INTO {ROLLUP} (month, supplier_id, isbn, purchase_qty, spend, purchase_count)
+        SELECT :month, p.supplier_id, p.isbn,
+               SUM(p.purchase_qty), SUM(p.purchase_qty * p.purchase_price), COUNT(*)
+        FROM ({sources}) p
+        GROUP BY p.supplier_id, p.isbn
+    """), {"month": month, "start": start, "end": end})
+
+
+def pending_months(now=None):
+    """尚未汇总的已结束月份（按时间顺序）"""
+    current = month_start(now or datetime.now())
+    start = rolled_up_before() or _first_purchase_month() or current
+    months = []
+    while start < current:
+        months.append(start)
+        start = next_month(start)
+    return months
+
+
+def build_rollup(max_months=None, now=None):
+    """
+    把尚未汇总的已结束月份逐月写入 t_purchase_monthly，每月一个事务并推进水位。
+    max_months 限制本次最多汇总的月份数。返回汇总的月份数。
+    """
+    months = pending_months(now)
+    if max_months is not None:
+        months = months[:max_months]
+    for start in months:
+        _build_month(start)
+        _set_watermark(next_month(start))
+        db.session.commit()
+    if not months and rolled_up_before() is None:
+        # 还没有已结束月份的进货：水位直接放到本月，之后每月只需汇总一个月
+        _set_watermark(month_start(now or datetime.now()))
+        db.session.commit()
+    return len(months)
+
+
+def _raw_branches(start, end, index):
+    """[start, end) 区间直接读进货单（含归档表），按 月份、供应商、ISBN 预聚合；返回 (SQL 列表, 参数)"""
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append(f"purchase_time >= :raw{index}_start")
+        params[f"raw{index}_start"] = start
+    if end is not None:
+        conditions.append(f"purchase_time < :raw{index}_end")
+        params[f"raw{index}_end"] = end
+    where = " AND ".join(conditions) or "1 = 1"
+    month = _month_expr('purchase_time')
+    branches = [f"""
+        SELECT {month} AS month, supplier_id, isbn,
+               SUM(purchase_qty) AS qty, SUM(purchase_qty * purchase_price) AS spend
+        FROM {table}
+        WHERE {where}
+        GROUP BY {month}, supplier_id, isbn
+    """ for table in purchase_sources(start or datetime.min)]
+    return branches, params
+
+
+def _summary_parts(start, end):
+    """
+    区间内完整的已汇总月份读 t_purchase_monthly，两端不完整的月份和未汇总的月份读进货单。
+    返回 (UNION ALL 子查询, 参数, 读汇总表的月份范围 {"from", "before"} 或 None)
+    """
+    watermark = rolled_up_before()
+    lo = month_ceil(start) if start is not None else None
+    hi = month_start(end) if end is not None else None
+    if watermark is not None:
+        hi = watermark if hi is None else min(hi, watermark)
+    if watermark is None or (lo is not None and lo >= hi):
+        branches, params = _raw_branches(start, end, 0)
+        return " UNION ALL ".join(branches), params, None
+
+    rollup = {"from": lo.strftime('%Y-%m') if lo else None, "before": hi.strftime('%Y-%m')}
+    params = {"roll_hi": rollup['before']}
+    rollup_condition = "month < :roll_hi"
+    if lo is not None:
+        rollup_condition += " AND month >= :roll_lo"
+        params["roll_lo"] = rollup['from']
+    branches = [f"""
+        SELECT month, supplier_id, isbn, purchase_qty AS qty, spend
+        FROM {ROLLUP}
+        WHERE {rollup_condition}
+    """]
+    if lo is not None and start < lo:
+        head, head_params = _raw_branches(start, lo, 1)
+        branches += head
+        params.update(head_params)
+    if end is None or hi < end:
+        tail, tail_params = _raw_branches(hi, end, 2)
+        branches += tail
+        params.update(tail_params)
+    return " UNION ALL ".join(branches), params, rollup
+
+
+def _money(value):
+    return round(float(value or 0), 2)
+
+
+def _summary_row(row):
+    """按 SQL 汇总结果计算平均进货价、按现行报价折算的平均价与价差"""
+    qty, spend = row['purchase_qty'] or 0, _money(row['spend'])
+    quoted_qty, quoted_spend = row['quoted_qty'] or 0, _money(row['quoted_spend'])
+    quote_spend = _money(row['quote_spend'])
+    variance = round(quoted_spend - quote_spend, 2)
+    return {
+        "purchase_qty": int(qty),
+        "spend": spend,
+        "avg_unit_price": round(spend / qty, 2) if qty else None,
+        "quoted_qty": int(quoted_qty),
+        "avg_quote_price": round(quote_spend / quoted_qty, 2) if quoted_qty else None,
+        "quote_variance": variance,
+        "quote_variance_pct": round(variance / quote_spend * 100, 2) if quote_spend else None,
+    }
+
+
+def purchase_summary(group_by, start, end, page, page_size):
+    """
+    按 group_by（supplier / isbn / month）汇总 [start, end) 内的进货数量、金额、平均进货价，
+    并与 t_supply_info 中现行报价比较（无报价的进货只计入数量和金额）。
+    返回 {"count", "rollup", "totals", "list"}，list 为第 page 页，rollup 为读汇总表的月份范围。
+    """
+    key, join, name = GROUPS[group_by]
+    parts, params, rollup = _summary_parts(start, end)
+    measures = """
+        SUM(p.qty) AS purchase_qty,
+        SUM(p.spend) AS spend,
+        SUM(CASE WHEN si.supply_price IS NULL THEN 0 ELSE p.qty END) AS quoted_qty,
+        SUM(CASE WHEN si.supply_price IS NULL THEN 0 ELSE p.spend END) AS quoted_spend,
+        SUM(p.qty * si.supply_price) AS quote_spend
+    """
+    source = f"""
+        FROM ({parts}) p
+        LEFT JOIN t_supply_info si ON si.supplier_id = p.supplier_id AND si.isbn = p.isbn
+    """
+    totals = db.session.execute(
+        text(f"SELECT COUNT(DISTINCT p.{key}) AS group_count, {measures} {source}"), params
+    ).mappings().one()
+
+    order = "a.month" if group_by == 'month' else f"a.spend DESC, a.{key}"
+    rows = db.session.execute(text(f"""
+        SELECT a.*{f", {name} AS name" if name else ""}
+        FROM (
+            SELECT p.{key} AS {key}, {measures}
+            {source}
+            GROUP BY p.{key}
+        ) a
+        {join}
+        ORDER BY {order}
+        LIMIT :limit OFFSET :offset
+    """), {**params, "limit": page_size, "offset": (page - 1) * page_size}).mappings().all()
+
+    items = []
+    for row in rows:
+        item = {key: row[key]}
+        if name:
+            item['supplier_name' if group_by == 'supplier' else 'title'] = row['name']
+        item.update(_summary_row(row))
+        items.append(item)
+    return {
+        "count": totals['group_count'] or 0,
+        "rollup": rollup,
+        "totals": _summary_row(totals),
+        "list": items,
+    }
@@ -0,0 +1,174 @@
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import bindparam, text
+
+from app.archive import SALES, order_sources, reaches_archive
+from app.bulk import chunked, insert_ignore_statement
+from app.db import db, in_read_snapshot
+
+DAILY = 'daily'
+MONTHLY = 'monthly'
+
+
+def period_key(kind, start):
+    return start.strftime('%Y-%m-%d' if kind == DAILY else '%Y-%m')
+
+
+def period_end(kind, start):
+    if kind == DAILY:
+        return start + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def is_closed(kind, start, now=None):
+    """日/月已经结束，之后的新订单不会再计入"""
+    return period_end(kind, start) <= (now or datetime.now())
+
+
+def _archived_rank(start, end):
+    """
+    区间触及归档表时的排行查询（存储过程只读热表），返回列与 proc_daily_rank / proc_monthly_rank 相同
+    """
+    orders = " UNION ALL ".join(
+        f"""SELECT od.isbn, od.order_qty
+            FROM {order_table} o
+            INNER JOIN {detail_table} od ON od.order_id = o.order_id
+            WHERE o.order_time >= :start AND o.order_time < :end"""
+        for order_table, detail_table in order_sources(start)
+    )
+    return db.session.execute(text(f"""
+        SELECT s.isbn, b.title, SUM(s.order_qty) AS total_sold
+        FROM ({orders}) s
+        INNER JOIN t_book b ON b.isbn = s.isbn
+        GROUP BY s.isbn, b.title
+        ORDER BY total_sold DESC
+    """), {"start": start, "end": end}).mappings().all()
+
+
+def _rank_rows(kind, start):
+    if reaches_archive(SALES, start):
+        return _archived_rank(start, period_end(kind, start))
+    if kind == DAILY:
+        return db.session.execute(
+            text("CALL proc_daily_rank(:p_date)"),
+            {"p_date": period_key(kind, start)}
+        ).mappings().all()
+    return db.session.execute(
+        text("CALL proc_monthly_rank(:p_year, :p_month)"),
+        {"p_year": start.year, "p_month": start.month}
+    ).mappings().all()
+
+
+def _book_info(isbns, chunk_size=1000):
+    """批量取图书的作者、出版社、定价：{isbn: row}"""
+    books = {}
+    stmt = text("SELECT isbn, author, publisher, price FROM t_book WHERE isbn IN :isbns").bindparams(
+        bindparam('isbns', expanding=True)
+    )
+    for part in chunked(sorted(set(isbns)), chunk_size):
+        for row in db.session.execute(stmt, {"isbns": part}).mappings():
+            books[row['isbn']] = row
+    return books
+
+
+def compute_ranking(kind, start):
+    """计算完整排行（未排序、未截断），每项含图书信息与按定价估算的销售额"""
+    rows = _rank_rows(kind, start)
+    books = _book_info(row['isbn'] for row in rows)
+    entries = []
+    for row in rows:
+        book = books.get(row['isbn'])
+
+        total_sales_amount = Decimal('0.00')
+        if book and book['price'] is not None:
+            total_sales_amount = Decimal(row['total_sold']) * book['price']
+
+        entries.append({
+            "isbn": row['isbn'],
+            "title": row['title'],
+            "author": book['author'] if book else None,
+            "publisher": book['publisher'] if book else None,
+            "price": float(book['price']) if book else None,
+            "total_sold_qty": int(row['total_sold']),
+            "total_sales_amount": float(total_sales_amount)
+        })
+    return entries
+
+
+def load_snapshot(kind, start):
+    payload = db.session.execute(
+        text("SELECT payload FROM t_rank_snapshot WHERE period_type = :kind AND period = :period"),
+        {"kind": kind, "period": period_key(kind, start)}
+    ).scalar()
+    return None if payload is None else json.loads(payload)
+
+
+def save_snapshot(kind, start, entries):
+    """写入快照并提交；并发写入同一期间时先写入者为准"""
+    db.session.execute(
+        insert_ignore_statement('t_rank_snapshot', ['period_type', 'period', 'payload', 'created_at']),
+        {
+            "period_type": kind,
+            "period": period_key(kind, start),
+            "payload": json.dumps(entries, ensure_ascii=False),
+            "created_at": datetime.now(),
+        }
+    )
+    db.session.commit()
+
+
+def ranking(kind, start, use_snapshot=True):
+    """
+    返回 (完整排行, 来源)。已结束的期间优先读快照，没有时计算后写入快照；
+    来源为 'snapshot'（读快照）、'stored'（本次写入）或 None（期间未结束，不缓存）。
+    """
+    if not use_snapshot or not is_closed(kind, start):
+        return compute_ranking(kind, start), None
+    entries = load_snapshot(kind, start)
+    if entries is not None:
+        return entries, 'snapshot'
+    entries = compute_ranking(kind, start)
+    if in_read_snapshot():
+        # 批量请求的只读快照内不写快照表，下次单独请求时再写入
+        return entries, None
+    save_snapshot(kind, start, entries)
+    return entries, 'stored'
+
+
+def invalidate_snapshots(moments):
+    """
+    删除包含这些时间点的日/月排行快照（如迟到退货对应的原订单时间），在调用方的事务内执行。
+    返回删除的快照数。
+    """
+    keys = {(DAILY, period_key(DAILY, m)) for m in moments} | {(MONTHLY, period_key(MONTHLY, m)) for m in moments}
+    if not keys:
+        return 0
+    deleted = 0
+    for kind in (DAILY, MONTHLY):
+        periods = sorted(period for k, period in keys if k == kind)
+        deleted += db.session.execute(
+            text("DELETE FROM t_rank_snapshot WHERE period_type = :kind AND period IN :periods")
+            .bindparams(bindparam('periods', expanding=True)),
+            {"kind": kind, "periods": periods}
+        ).rowcount
+    return deleted
+
+
+def build_snapshots(days, now=None):
+    """夜间任务：为最近 days 天内已结束、尚无快照的日和月生成快照，返回 (日快照数, 月快照数)"""
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    days_built = months_built = 0
+    months = set()
+    for offset in range(days, 0, -1):
+        day = today - timedelta(days=offset)
+        months.add(day.replace(day=1))
+        if load_snapshot(DAILY, day) is None:
+            save_snapshot(DAILY, day, compute_ranking(DAILY, day))
+            days_built += 1
+    for start in sorted(months):
+        if is_closed(MONTHLY, start, today) and load_snapshot(MONTHLY, start) is None:
+            save_snapshot(MONTHLY, start, compute_ranking(MONTHLY, start))
+            months_built += 1
+    return days_built, months_built
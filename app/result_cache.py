@@ -0,0 +1,236 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, current_app, g, request
+
+from app.db import in_read_snapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class ResultCache:
+    """
+    同机所有 worker 共用的结果缓存，存放在一个 SQLite 文件（WAL 模式）中。
+    键为 接口 + 规范化后的查询参数；写接口执行后按表作废相关条目；总大小超限时按最近访问时间淘汰。
+    每张表有一个版本号，写入缓存时若依赖表的版本已变（计算期间有写操作）则放弃写入，避免缓存旧结果。
+    """
+
+    def __init__(self):
+        self.path = None
+        self.endpoints = {}
+        self.writes = {}
+        self.ttl = 300
+        self.max_bytes = 64 * 1024 * 1024
+        self.max_entry_bytes = 4 * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.errors = 0
+        self._local = threading.local()
+
+    def init_app(self, app):
+        config = app.config
+        self.path = config.get('RESULT_CACHE_PATH')
+        self.endpoints = {k: tuple(v) for k, v in config.get('RESULT_CACHE_ENDPOINTS', {}).items()}
+        self.writes = {k: tuple(v) for k, v in config.get('RESULT_CACHE_WRITES', {}).items()}
+        self.ttl = config.get('RESULT_CACHE_TTL', 300)
+        self.max_bytes = config.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self.max_entry_bytes = config.get('RESULT_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024)
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # 每个线程一个连接；fork 之后不能沿用父进程的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def versions(self, tables):
+        conn = self._connect()
+        placeholders = ', '.join('?' for _ in tables)
+        found = dict(conn.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})", tables
+        ).fetchall())
+        return tuple(found.get(table, 0) for table in tables)
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT status, headers, body, accessed FROM entries WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, accessed = row
+        # 访问时间精确到秒级即可满足 LRU，减少命中时的写入
+        if now - accessed > 1:
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return status, json.loads(headers), body
+
+    def put(self, key, endpoint, tables, versions, status, headers, body):
+        """依赖表版本与计算前一致时写入并按需淘汰；返回是否写入"""
+        size = len(body) + len(key)
+        if size > self.max_entry_bytes:
+            return False
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.versions(tables) != versions:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, endpoint, tables, status, headers, body, size, expires, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, ',' + ','.join(tables) + ',', status, json.dumps(headers), body, size,
+                 now + self.ttl, now)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - int(self.max_bytes * 0.9), now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def _evict(self, conn, excess, now):
+        """先删过期条目，再按最近访问时间从旧到新删除，直到腾出 excess 字节"""
+        freed = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires <= ?", (now,)).fetchone()[0]
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        if freed >= excess:
+            return
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            keys.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+
+    def invalidate(self, tables):
+        """表被写入：版本号加一并删除依赖这些表的条目"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                conn.execute(
+                    "INSERT INTO table_versions (table_name, version) VALUES (?, 1)"
+                    " ON CONFLICT (table_name) DO UPDATE SET version = version + 1",
+                    (table,)
+                )
+                conn.execute("DELETE FROM entries WHERE tables LIKE ?", (f'%,{table},%',))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.invalidations += 1
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+    def stats(self):
+        entries, size = 0, 0
+        if self.path:
+            entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "enabled": bool(self.path),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+result_cache = ResultCache()
+
+
+def _cache_key():
+    return request.endpoint + '?' + '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+
+
+def serve_cached():
+    """
+    before_request：命中时直接返回缓存的响应；未命中时记下依赖表版本，供 after_request 写入。
+    批量请求的只读快照内既不读也不写缓存
+    """
+    if request.method != 'GET' or request.endpoint not in result_cache.endpoints or in_read_snapshot():
+        return None
+    key = _cache_key()
+    tables = result_cache.endpoints[request.endpoint]
+    try:
+        cached = result_cache.get(key)
+        if cached is None:
+            g.result_cache = (key, tables, result_cache.versions(tables))
+            result_cache.misses += 1
+            return None
+    except sqlite3.Error as e:
+        result_cache.errors += 1
+        current_app.logger.warning(f"结果缓存读取失败: {e}")
+        return None
+
+    result_cache.hits += 1
+    status, headers, body = cached
+    response = Response(body, status=status, headers=headers)
+    response.headers['X-Result-Cache'] = 'hit'
+    if response.headers.get('ETag'):
+        response.make_conditional(request)
+    return response
+
+
+def store_result(response):
+    """after_request：缓存未命中时写入成功的响应；写接口执行后作废依赖其写入表的条目"""
+    try:
+        pending = g.pop('result_cache', None)
+        if pending is not None and response.status_code == 200 and not response.is_streamed:
+            key, tables, versions = pending
+            headers = [(k, v) for k, v in response.headers.items() if k not in ('Content-Length', 'Set-Cookie')]
+            if result_cache.put(key, request.endpoint, tables, versions, 200, headers, response.get_data()):
+                result_cache.stores += 1
+        tables = result_cache.writes.get(request.endpoint)
+        if tables and request.method != 'GET':
+            result_cache.invalidate(tables)
+    except sqlite3.Error as e:
+        result_cache.errors += 1
+        current_app.logger.warning(f"结果缓存写入失败: {e}")
+    return response
+
+
+def init_result_cache(app):
+    result_cache.init_app(app)
+    if not result_cache.path:
+        return
+    app.before_request(serve_cached)
+    app.after_request(store_result)
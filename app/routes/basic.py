@@ -1,17 +1,23 @@
 from flask import Blueprint, request
 from app.models import Book,Supplier,SupplyInfo
 from app.db import db
-from sqlalchemy import text
+from app.auth import public
+from sqlalchemy import text, bindparam
+from app.supply_index import refresh_supply_best
+from app.bulk import StreamError, chunked, insert_ignore_statement, iter_records, parse_price, upsert_statement
+from app.projection import parse_fields
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 basic_bp = Blueprint('basic', __name__)
 @basic_bp.route('/')
+@public
 def hello_world():
     """测试后端启动"""
     return 'Hello World!'
 
 
 @basic_bp.route('/test-db', methods=['GET'])
+@public
 def test_db_connection():
     """测试数据库连接"""
     try:
@@ -100,25 +106,28 @@ def book_update():
 def book_delete():
     """删除图书"""
     try:
-        print('-----')
         data = request.json
         isbn = data['isbn']
-        print('-----')
         # 查找图书
         book = Book.query.filter_by(isbn=isbn).first()
 
-        print('-----')
         if not book:
             return {
                 "code": 404,
                 "msg": f"Book with ISBN {isbn} not found.",
             }, 201
+        archived = db.session.execute(
+            text(f"SELECT 1 FROM t_book WHERE isbn = :isbn AND NOT ({_BOOK_UNARCHIVED})"), {"isbn": isbn}
+        ).first()
+        if archived:
+            return {
+                "code": 400,
+                "msg": f"Fail.Reason:图书{isbn}仍被已归档的订单、退货或进货记录引用，不能删除",
+            }, 201
 
-        print('-----')
         db.session.delete(book)
         db.session.commit()
 
-        print('-----')
         return {
             "code": 200,
             "msg": "Success.",
@@ -130,6 +139,243 @@ def book_delete():
             "msg": f"Fail.Reason:{str(e)}",
         }, 201
 
+# ========== 图书批量导入接口 ==========
+_BOOK_COLUMNS = ['isbn', 'title', 'author', 'publisher', 'price']
+
+
+def _book_row(record):
+    """校验并规整一条导入记录，非法时抛出 ValueError"""
+    isbn = str(record.get('isbn') or '').strip()
+    title = str(record.get('title') or '').strip()
+    if not isbn or len(isbn) > 13:
+        raise ValueError(f"ISBN为空或超过13位: {isbn!r}")
+    if not title or len(title) > 100:
+        raise ValueError("书名为空或超过100字")
+    if record.get('price') in (None, ''):
+        raise ValueError("缺少定价")
+    row = {'isbn': isbn, 'title': title, 'price': parse_price(record['price'])}
+    for field in ('author', 'publisher'):
+        value = str(record.get(field) or '').strip() or None
+        if value and len(value) > 50:
+            raise ValueError(f"{field}超过50字")
+        row[field] = value
+    return row
+
+
+@basic_bp.route('/book/import', methods=['POST'])
+def book_import():
+    """
+    流式批量导入图书（已存在的 ISBN 更新书目信息），并补建库存为 0 的 t_stock 记录。
+    请求体为 CSV（首行表头 isbn,title,author,publisher,price）或 NDJSON（每行一个对象），
+    也可用 multipart 的 file 字段上传；格式由 ?format=csv|ndjson 或 Content-Type 决定。
+    按块提交，每块返回成功行数与错误行（每块最多列出 MAX_ERRORS 条）。
+    上传内容中途无法解码或解析时，之前的块照常提交，truncated 为 true，停止位置记在最后一块的错误中。
+    """
+    MAX_ERRORS = 20
+    try:
+        chunk_size = min(max(request.args.get('chunk_size', 2000, type=int), 1), 10000)
+        upload = request.files.get('file')
+        content_type = (upload.mimetype if upload else request.mimetype) or ''
+        fmt = request.args.get('format') or ('csv' if 'csv' in content_type else 'ndjson')
+        if fmt not in ('csv', 'ndjson'):
+            return {"code": 400, "msg": "format仅支持csv或ndjson"}, 201
+        stream = upload.stream if upload else request.stream
+
+        book_sql = upsert_statement('t_book', _BOOK_COLUMNS, ['isbn'])
+        stock_sql = insert_ignore_statement('t_stock', ['isbn', 'quantity'])
+
+        chunks = []
+        total_rows = total_applied = total_failed = 0
+        truncated = False
+        for index, records in enumerate(chunked(iter_records(stream, fmt), chunk_size), start=1):
+            rows, errors = {}, []
+            for line_no, record in records:
+                if isinstance(record, StreamError):
+                    truncated = True
+                try:
+                    if isinstance(record, str):
+                        raise ValueError(record)
+                    row = _book_row(record)
+                    rows[row['isbn']] = row  # 同一块内重复 ISBN 以最后一行为准
+                except (ValueError, TypeError, AttributeError) as e:
+                    errors.append({"line": line_no, "error": str(e)})
+
+            failed = len(errors)
+            if rows:
+                try:
+                    db.session.execute(book_sql, list(rows.values()))
+                    db.session.execute(stock_sql, [{"isbn": isbn, "quantity": 0} for isbn in rows])
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    failed = len(records)
+                    errors.append({"line": None, "error": f"本块写入失败，已回滚: {getattr(e, 'orig', None) or e}"})
+            applied = len(records) - failed
+
+            total_rows += len(records)
+            total_applied += applied
+            total_failed += failed
+            chunks.append({
+                "chunk": index,
+                "first_line": records[0][0],
+                "rows": len(records),
+                "applied": applied,
+                "failed": failed,
+                "errors": errors[:MAX_ERRORS],
+            })
+
+        return {
+            "code": 200,
+            "msg": "Success.",
+            "data": {
+                "rows": total_rows,
+                "applied": total_applied,
+                "failed": total_failed,
+                "truncated": truncated,
+                "chunks": chunks
+            }
+        }, 200
+    except Exception as e:
+        db.session.rollback()
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 201
+
+
+# ========== 图书批量删除/修改接口 ==========
+_BULK_MAX_ISBNS = 10000
+
+# 仍有报价、采购、销售或退货记录的图书不能删除
+# 归档表没有外键，删除前须显式检查是否仍被归档单据引用
+_BOOK_UNARCHIVED = """
+    NOT EXISTS (SELECT 1 FROM t_purchase_archive pa WHERE pa.isbn = t_book.isbn)
+    AND NOT EXISTS (SELECT 1 FROM t_order_detail_archive oda WHERE oda.isbn = t_book.isbn)
+    AND NOT EXISTS (SELECT 1 FROM t_return_detail_archive rda WHERE rda.isbn = t_book.isbn)
+"""
+_BOOK_DELETABLE = f"""
+    NOT EXISTS (SELECT 1 FROM t_supply_info si WHERE si.isbn = t_book.isbn)
+    AND NOT EXISTS (SELECT 1 FROM t_purchase p WHERE p.isbn = t_book.isbn)
+    AND NOT EXISTS (SELECT 1 FROM t_order_detail od WHERE od.isbn = t_book.isbn)
+    AND NOT EXISTS (SELECT 1 FROM t_return_detail rd WHERE rd.isbn = t_book.isbn)
+    AND {_BOOK_UNARCHIVED}
+"""
+
+
+def _book_filter(data):
+    """
+    由 {"isbns": [...]} 和/或 {"filter": {"publisher", "author", "price_min", "price_max"}}
+    构造 t_book 的 WHERE 条件，返回 (条件SQL, 参数, 需要展开的参数名)；未给任何条件时抛出 ValueError
+    """
+    conditions, params, expanding = [], {}, []
+    isbns = data.get('isbns')
+    if isbns is not None:
+        isbns = list(dict.fromkeys(str(i).strip() for i in isbns if str(i).strip()))
+        if not isbns:
+            raise ValueError("isbns不能为空")
+        if len(isbns) > _BULK_MAX_ISBNS:
+            raise ValueError(f"单次最多处理{_BULK_MAX_ISBNS}个ISBN")
+        conditions.append("isbn IN :isbns")
+        params['isbns'] = isbns
+        expanding.append('isbns')
+
+    criteria = data.get('filter') or {}
+    for field in ('publisher', 'author'):
+        if criteria.get(field) is not None:
+            conditions.append(f"{field} = :{field}")
+            params[field] = criteria[field]
+    if criteria.get('price_min') is not None:
+        conditions.append("price >= :price_min")
+        params['price_min'] = parse_price(criteria['price_min'])
+    if criteria.get('price_max') is not None:
+        conditions.append("price <= :price_max")
+        params['price_max'] = parse_price(criteria['price_max'])
+
+    if not conditions:
+        raise ValueError("需要提供isbns或filter条件")
+    return " AND ".join(conditions), params, expanding
+
+
+def _book_text(sql, expanding):
+    return text(sql).bindparams(*[bindparam(name, expanding=True) for name in expanding])
+
+
+@basic_bp.route('/book/bulk-delete', methods=['POST'])
+def book_bulk_delete():
+    """
+    按ISBN列表或条件批量删除图书（连同库存记录），固定执行3条SQL。
+    仍有报价、采购、销售或退货记录（含归档表）的图书跳过，计入 skipped。
+    JSON: {"isbns": [...]} 或 {"filter": {"publisher": "X"}}
+    """
+    try:
+        where, params, expanding = _book_filter(request.get_json(silent=True) or {})
+
+        matched = db.session.execute(
+            _book_text(f"SELECT COUNT(*) FROM t_book WHERE {where}", expanding), params
+        ).scalar()
+        db.session.execute(_book_text(f"""
+            DELETE FROM t_stock
+            WHERE isbn IN (SELECT isbn FROM t_book WHERE {where} AND {_BOOK_DELETABLE})
+        """, expanding), params)
+        deleted = db.session.execute(
+            _book_text(f"DELETE FROM t_book WHERE {where} AND {_BOOK_DELETABLE}", expanding), params
+        ).rowcount
+        db.session.commit()
+
+        return {
+            "code": 200,
+            "msg": "Success.",
+            "data": {"matched": matched, "deleted": deleted, "skipped": matched - deleted}
+        }, 200
+    except Exception as e:
+        db.session.rollback()
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 201
+
+
+@basic_bp.route('/book/bulk-update', methods=['POST'])
+def book_bulk_update():
+    """
+    按ISBN列表或条件批量修改图书，单条 UPDATE 完成。
+    JSON: {"filter": {"publisher": "X"}, "set": {"price_factor": 1.05}}
+    set 支持 price_factor（按比例调价，保留两位小数）、price、author、publisher、title
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        where, params, expanding = _book_filter(data)
+        changes = data.get('set') or {}
+
+        assignments = []
+        if changes.get('price_factor') is not None and changes.get('price') is not None:
+            return {"code": 400, "msg": "price_factor与price不能同时指定"}, 201
+        if changes.get('price_factor') is not None:
+            factor = float(changes['price_factor'])
+            if not 0 < factor <= 10:
+                return {"code": 400, "msg": "price_factor需在(0, 10]之间"}, 201
+            assignments.append("price = ROUND(price * :set_price_factor, 2)")
+            params['set_price_factor'] = factor
+        if changes.get('price') is not None:
+            assignments.append("price = :set_price")
+            params['set_price'] = parse_price(changes['price'])
+        for field, max_len in (('title', 100), ('author', 50), ('publisher', 50)):
+            if field in changes:
+                value = changes[field]
+                if value is not None and len(str(value)) > max_len:
+                    return {"code": 400, "msg": f"{field}超过{max_len}字"}, 201
+                if field == 'title' and not value:
+                    return {"code": 400, "msg": "title不能为空"}, 201
+                assignments.append(f"{field} = :set_{field}")
+                params[f'set_{field}'] = value
+        if not assignments:
+            return {"code": 400, "msg": "set中没有可修改的字段"}, 201
+
+        updated = db.session.execute(
+            _book_text(f"UPDATE t_book SET {', '.join(assignments)} WHERE {where}", expanding), params
+        ).rowcount
+        db.session.commit()
+
+        return {"code": 200, "msg": "Success.", "data": {"updated": updated}}, 200
+    except Exception as e:
+        db.session.rollback()
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 201
+
+
 # ========== 供应商相关接口 ==========
 
 @basic_bp.route('/supplier/insert', methods=['POST'])
@@ -231,6 +477,8 @@ def supply_info_insert():
             supply_price=data['supply_price']
         )
         db.session.add(new_supply_info)
+        db.session.flush()
+        refresh_supply_best([new_supply_info.isbn])
         db.session.commit()
 
         return {
@@ -281,6 +529,8 @@ def supply_info_update():
         # 更新供货价格
         if 'supply_price' in data:
             supply_info.supply_price = data['supply_price']
+            db.session.flush()
+            refresh_supply_best([isbn])
 
         db.session.commit()
 
@@ -317,6 +567,8 @@ def supply_info_delete():
             }, 201
 
         db.session.delete(supply_info)
+        db.session.flush()
+        refresh_supply_best([isbn])
         db.session.commit()
 
         return {
@@ -331,9 +583,108 @@ def supply_info_delete():
         }, 201
 
 
+@basic_bp.route('/supply-info/bulk', methods=['POST'])
+def supply_info_bulk():
+    """
+    批量同步某供应商的整张价目表
+    JSON: {"supplier_id": 1, "items": [{"isbn": "...", "supply_price": 12.5}, ...], "remove_missing": false}
+    与库中该供应商的现有报价一次性比对后，在同一事务内分块执行新增/改价，
+    remove_missing 为 true 时删除价目表中已不存在的图书报价。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        supplier_id = int(data['supplier_id'])
+        items = data.get('items') or []
+        remove_missing = bool(data.get('remove_missing', False))
+        chunk_size = 1000
+
+        if not db.session.execute(
+            text("SELECT 1 FROM t_supplier WHERE supplier_id = :sid"), {"sid": supplier_id}
+        ).first():
+            return {"code": 404, "msg": f"Supplier with ID {supplier_id} not found."}, 201
+
+        prices, errors = {}, []
+        for i, item in enumerate(items):
+            try:
+                isbn = str(item.get('isbn') or '').strip()
+                if not isbn or len(isbn) > 13:
+                    raise ValueError(f"ISBN为空或超过13位: {isbn!r}")
+                prices[isbn] = parse_price(item.get('supply_price'))
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append({"index": i, "error": str(e)})
+
+        # 价目表中不在图书表里的 ISBN 无法建立报价
+        known = set()
+        exists_sql = text("SELECT isbn FROM t_book WHERE isbn IN :isbns").bindparams(
+            bindparam('isbns', expanding=True)
+        )
+        for part in chunked(list(prices), chunk_size):
+            known.update(r[0] for r in db.session.execute(exists_sql, {"isbns": part}))
+        unknown = [isbn for isbn in prices if isbn not in known]
+        for isbn in unknown:
+            del prices[isbn]
+
+        existing = {
+            r[0]: r[1] for r in db.session.execute(
+                text("SELECT isbn, supply_price FROM t_supply_info WHERE supplier_id = :sid"),
+                {"sid": supplier_id}
+            )
+        }
+        inserted = [isbn for isbn in prices if isbn not in existing]
+        updated = [isbn for isbn in prices if isbn in existing and existing[isbn] != prices[isbn]]
+        removed = [isbn for isbn in existing if isbn not in prices] if remove_missing else []
+
+        upsert_sql = upsert_statement('t_supply_info', ['supplier_id', 'isbn', 'supply_price'],
+                                      ['supplier_id', 'isbn'])
+        for part in chunked(inserted + updated, chunk_size):
+            db.session.execute(upsert_sql, [
+                {"supplier_id": supplier_id, "isbn": isbn, "supply_price": prices[isbn]} for isbn in part
+            ])
+        delete_sql = text(
+            "DELETE FROM t_supply_info WHERE supplier_id = :sid AND isbn IN :isbns"
+        ).bindparams(bindparam('isbns', expanding=True))
+        for part in chunked(removed, chunk_size):
+            db.session.execute(delete_sql, {"sid": supplier_id, "isbns": part})
+
+        refresh_supply_best(inserted + updated + removed, chunk_size=chunk_size)
+        db.session.commit()
+
+        return {
+            "code": 200,
+            "msg": "Success.",
+            "data": {
+                "inserted": len(inserted),
+                "updated": len(updated),
+                "unchanged": len(prices) - len(inserted) - len(updated),
+                "removed": len(removed),
+                "unknown": len(unknown),
+                "unknown_isbns": unknown[:100],
+                "errors": errors[:100]
+            }
+        }, 200
+    except Exception as e:
+        db.session.rollback()
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 201
+
+
+# 可投影的字段及其输出格式
+_BOOK_FIELDS = {
+    'isbn': lambda value: value,
+    'title': lambda value: value or '',
+    'author': lambda value: value or '',
+    'publisher': lambda value: value or '',
+    'price': lambda value: float(value) if value else 0.0,
+}
+
+
 @basic_bp.route('/book/select', methods=['GET'])
 def book_select():
-    """图书基础信息表 - 支持分页、排序和搜索"""
+    """图书基础信息表 - 支持分页、排序、搜索和字段投影（fields，可选 isbn,title,author,publisher,price）"""
+    try:
+        fields = parse_fields(request.args, tuple(_BOOK_FIELDS))
+    except ValueError as e:
+        return {"code": 400, "msg": f"fields参数错误: {e}"}, 400
+
     try:
         # 获取查询参数
         keyword = request.args.get('keyword', '').strip()
@@ -377,19 +728,14 @@ def book_select():
         if sort_dir == 'desc':
             sort_column = sort_column.desc()
 
-        # 应用排序和分页
-        books = query.order_by(sort_column).limit(limit).all()
+        # 应用排序和分页，只查询 fields 中的列
+        books = query.with_entities(*[getattr(Book, name) for name in fields]) \
+            .order_by(sort_column).limit(limit).all()
 
         # 构建返回数据
         book_list = []
         for book in books:
-            book_list.append({
-                'isbn': book.isbn,
-                'title': book.title or '',
-                'author': book.author or '',
-                'publisher': book.publisher or '',
-                'price': float(book.price) if book.price else 0.0
-            })
+            book_list.append({name: _BOOK_FIELDS[name](value) for name, value in zip(fields, book)})
 
         return {
             "code": 200,
@@ -492,3 +838,46 @@ def supply_info_select():
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
     
+
+
+# ========== 最低供货价查询接口 ==========
+@basic_bp.route('/supply-info/best', methods=['GET', 'POST'])
+def supply_info_best():
+    """
+    批量查询最低/次低供货价
+    GET: ?isbns=isbn1,isbn2,...   POST JSON: {"isbns": [...]}
+    """
+    try:
+        if request.method == 'POST':
+            isbns = (request.get_json(silent=True) or {}).get('isbns') or []
+        else:
+            isbns = [s.strip() for s in request.args.get('isbns', '').split(',')]
+        isbns = list(dict.fromkeys(str(i) for i in isbns if i))
+
+        if not isbns:
+            return {"code": 400, "msg": "isbns参数必填"}, 201
+        if len(isbns) > 1000:
+            return {"code": 400, "msg": "单次最多查询1000个ISBN"}, 201
+
+        rows = db.session.execute(text("""
+            SELECT sb.isbn,
+                   sb.best_supplier_id, s1.supplier_name AS best_supplier_name, sb.best_price,
+                   sb.second_supplier_id, s2.supplier_name AS second_supplier_name, sb.second_price
+            FROM t_supply_best sb
+            LEFT JOIN t_supplier s1 ON s1.supplier_id = sb.best_supplier_id
+            LEFT JOIN t_supplier s2 ON s2.supplier_id = sb.second_supplier_id
+            WHERE sb.isbn IN :isbns
+        """).bindparams(bindparam('isbns', expanding=True)), {"isbns": isbns}).fetchall()
+
+        found = {row.isbn: dict(row._mapping) for row in rows}
+        return {
+            "code": 200,
+            "msg": "Success.",
+            "data": {
+                "count": len(found),
+                "list": [found[i] for i in isbns if i in found],
+                "missing": [i for i in isbns if i not in found]
+            }
+        }, 200
+    except Exception as e:
+        return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
@@ -0,0 +1,158 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from flask import Blueprint, current_app, g, request
+from sqlalchemy import text
+
+from app.admission import admission
+from app.db import db
+
+batch_bp = Blueprint('batch', __name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+# 准入控制拒绝时的子响应（按身份比较，区分视图自身返回的 503）
+_BUSY = (503, {"code": 503, "msg": "服务繁忙，请稍后重试"})
+
+
+def _pool(max_workers):
+    """并行执行用的线程池，fork 之后在每个 worker 中重新创建"""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _sub_environ(environ, path, params):
+    """以外层请求为模板构造子请求的 WSGI environ：沿用请求头（含令牌），替换为无请求体的 GET"""
+    parts = urlsplit(path)
+    query = parts.query
+    if params:
+        query = '&'.join(filter(None, [query, urlencode(params, doseq=True)]))
+    sub = {k: v for k, v in environ.items() if not k.startswith('werkzeug.')}
+    sub.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': '0',
+        'CONTENT_TYPE': '',
+        'wsgi.input': io.BytesIO(b''),
+    })
+    sub.pop('HTTP_IF_NONE_MATCH', None)
+    sub.pop('HTTP_IF_MODIFIED_SINCE', None)
+    return sub
+
+
+def _dispatch(app, environ, snapshot=False):
+    """
+    在当前应用上下文中分发一个子请求，返回 (状态码, 响应体)。
+    子请求完整经过 before/after_request（认证、准入、缓存、采样、指标），使用自己的 g，结束后恢复外层请求的 g；
+    snapshot 为 True 时处于外层的只读事务中：不提交，出错也不回滚，以免结束快照。
+    """
+    state = vars(g._get_current_object())
+    outer = dict(state)
+    state.clear()
+    g.read_snapshot = snapshot
+    try:
+        with app.request_context(environ):
+            endpoint = request.endpoint
+            excluded = app.config.get('BATCH_EXCLUDED_ENDPOINTS', [])
+            if endpoint is None or endpoint in excluded or request.routing_exception is not None:
+                return 404, {"code": 404, "msg": "不支持的子请求路径"}
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                if not snapshot:
+                    db.session.rollback()
+                return 500, {"code": 500, "msg": f"Fail.Reason:{e}"}
+            if response.status_code == 503 and admission.controlled(endpoint) and 'admission_limiter' not in g:
+                return _BUSY
+        body = response.get_json(silent=True)
+        if body is None:
+            body = response.get_data(as_text=True)
+        return response.status_code, body
+    finally:
+        timings = state.get('sql_timings')
+        state.clear()
+        state.update(outer)
+        if timings is not None and outer.get('sql_timings') is not None:
+            outer['sql_timings'].merge(timings)
+
+
+def _dispatch_isolated(app, environ):
+    """线程池中执行：独立的应用上下文与数据库连接"""
+    with app.app_context():
+        return _dispatch(app, environ)
+
+
+@batch_bp.route('/batch', methods=['POST'])
+def batch():
+    """
+    一次请求执行多个只读子请求，直接分发给各蓝图的视图函数。
+    请求 JSON: {"requests": [{"id": str, "path": "/statistic/stock/shortage", "params": {...}}], "parallel": false}
+    默认顺序执行，所有子请求共用同一个数据库连接和只读事务（同一快照），不读结果缓存、不合并请求，
+    会写表的只读接口（排行快照、进货月度汇总）在批量中跳过写入，其它提交被拒绝；
+    若某个子请求的视图自行回滚而结束了事务，之后的子请求不再处于同一快照，返回的 snapshot 为 false。
+    parallel 为 true 时在线程池中并行执行，每个子请求使用各自的连接，不保证同一快照（snapshot 为 false）。
+    返回: {"count": n, "snapshot": bool, "responses": [{"id", "path", "status", "body"}]}，顺序与请求一致
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    parallel = bool(data.get('parallel', False))
+    max_requests = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+
+    if not isinstance(items, list) or not items:
+        return {"code": 400, "msg": "requests必须是非空数组"}, 400
+    if len(items) > max_requests:
+        return {"code": 400, "msg": f"单次最多{max_requests}个子请求"}, 400
+
+    subs = []
+    for index, item in enumerate(items):
+        path = item.get('path') if isinstance(item, dict) else None
+        params = item.get('params') if isinstance(item, dict) else None
+        if not isinstance(path, str) or not path.startswith('/'):
+            return {"code": 400, "msg": f"第{index + 1}个子请求缺少以/开头的path"}, 400
+        if params is not None and not isinstance(params, dict):
+            return {"code": 400, "msg": f"第{index + 1}个子请求的params必须是对象"}, 400
+        subs.append((item.get('id', index), path, _sub_environ(request.environ, path, params)))
+
+    app = current_app._get_current_object()
+    try:
+        if parallel:
+            snapshot = False
+            pool = _pool(current_app.config.get('BATCH_MAX_WORKERS', 4))
+            futures = [pool.submit(_dispatch_isolated, app, environ) for _, _, environ in subs]
+            results = [future.result() for future in futures]
+            # 并行时超出准入总量而被拒绝的子请求，再逐个顺序执行一次
+            for index, result in enumerate(results):
+                if result is _BUSY:
+                    results[index] = _dispatch_isolated(app, subs[index][2])
+        else:
+            # 先取得连接，之后各子请求都在同一个会话（连接、事务）中执行
+            db.session.connection()
+            if db.engine.dialect.name == 'mysql':
+                db.session.execute(text("START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+            transaction = db.session().get_transaction()
+            results = []
+            for _, _, environ in subs:
+                results.append(_dispatch(app, environ, snapshot=True))
+            # 视图自行回滚会结束事务，之后的子请求在新事务中执行
+            snapshot = db.session().get_transaction() is transaction
+    finally:
+        db.session.rollback()
+
+    responses = [
+        {"id": sub_id, "path": path, "status": status, "body": body}
+        for (sub_id, path, _), (status, body) in zip(subs, results)
+    ]
+    return {"code": 200, "msg": "成功", "data": {
+        "count": len(responses), "snapshot": snapshot, "responses": responses
+    }}, 200
@@ -1,6 +1,11 @@
 from flask import Blueprint, request
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from app.db import db
+from app.auth import public, current_user_id
+from app.archive import SALES, archived_before, history_range, order_sources, range_condition
+from app.bulk import chunked
+from app.events import publish
+from app.projection import parse_fields, parse_flag
 import time
 import random
 from datetime import datetime
@@ -8,46 +13,105 @@ from datetime import datetime
 order_bp = Blueprint('order', __name__)
 
 @order_bp.route('/')
+@public
 def order_hello():
     """测试 order 蓝图是否生效"""
     return 'order module OK'
 
 
 # ========== 销售订单视图接口 ==========
+# 可投影的字段及其输出格式；username 需关联 t_user
+_ORDER_FIELDS = {
+    'order_id': lambda value: value,
+    'order_time': lambda value: value.isoformat(),
+    'user_id': lambda value: value,
+    'username': lambda value: value,
+    'total_amount': lambda value: float(value),
+}
+
+
+def _order_details(sources, orders, chunk_size=1000):
+    """按数据源批量取订单明细（每块 chunk_size 个订单一条 IN 查询）：{(数据源编号, order_id): [明细]}"""
+    details = {}
+    for src, (_, detail_table) in enumerate(sources):
+        order_ids = [o.detail_order_id for o in orders if o.src == src]
+        stmt = text(f"""
+            SELECT
+                od.order_id,
+                od.isbn,
+                b.title,
+                b.author,
+                b.publisher,
+                od.order_price,
+                od.order_qty
+            FROM {detail_table} od
+            INNER JOIN t_book b ON od.isbn = b.isbn
+            WHERE od.order_id IN :oids
+        """).bindparams(bindparam('oids', expanding=True))
+        for part in chunked(order_ids, chunk_size):
+            for d in db.session.execute(stmt, {"oids": part}).mappings():
+                detail = dict(d)
+                details.setdefault((src, detail.pop('order_id')), []).append(detail)
+    return details
+
+
 @order_bp.route('/select', methods=['GET'])
 def order_select():
+    """
+    销售记录，按时间倒序。可选 from/to（YYYY-MM-DD）限定时间范围；
+    不给 from 时只查热表，from 早于归档水位时才合并读取归档表；
+    只查热表且已有归档时返回 archived_before，提示更早的记录需用 from 查询。
+    fields（逗号分隔）只查询并返回指定字段；details=false 时不查询明细。
+    """
+    try:
+        start, end = history_range(request.args)
+    except ValueError as e:
+        return {"code": 400, "msg": f"from/to参数错误: {e}"}, 400
     try:
-        orders = db.session.execute(text("""
-            SELECT order_id, order_time, user_id, username, total_amount
-            FROM v_sales_records
-            ORDER BY order_time DESC
-        """)).fetchall()
+        fields = parse_fields(request.args, tuple(_ORDER_FIELDS))
+        with_details = parse_flag(request.args, 'details')
+    except ValueError as e:
+        return {"code": 400, "msg": f"fields/details参数错误: {e}"}, 400
 
+    # 内层只取用到的列：排序用的 order_time、关联 t_user 的 user_id、查明细用的 order_id 与数据源编号
+    needed = {'order_time'} | {f for f in fields if f != 'username'}
+    if 'username' in fields:
+        needed.add('user_id')
+    if with_details:
+        needed.add('order_id')
+    columns = [c for c in ('order_id', 'order_time', 'user_id', 'total_amount') if c in needed]
+    outer = [f"o.{f}" if f != 'username' else "u.username" for f in fields]
+    if with_details:
+        outer += ["o.order_id AS detail_order_id", "o.src"]
+
+    try:
+        sources = order_sources(start)
+        headers = " UNION ALL ".join(
+            f"""SELECT {', '.join(columns)}, {i} AS src
+                FROM {order_table} WHERE {range_condition('order_time', start, end)}"""
+            for i, (order_table, _) in enumerate(sources)
+        )
+        orders = db.session.execute(text(f"""
+            SELECT {', '.join(outer)}
+            FROM ({headers}) o
+            {"INNER JOIN t_user u ON u.user_id = o.user_id" if 'username' in fields else ""}
+            ORDER BY o.order_time DESC
+        """), {"start": start, "end": end}).fetchall()
+
+        details = _order_details(sources, orders) if with_details else None
         result = []
         for o in orders:
-            details = db.session.execute(text("""
-                SELECT
-                    od.isbn,
-                    b.title,
-                    b.author,
-                    b.publisher,
-                    od.order_price,
-                    od.order_qty
-                FROM t_order_detail od
-                INNER JOIN t_book b ON od.isbn = b.isbn
-                WHERE od.order_id = :oid
-            """), {"oid": o.order_id}).fetchall()
-
-            result.append({
-                "order_id": o.order_id,
-                "order_time": o.order_time.isoformat(),
-                "user_id": o.user_id,
-                "username": o.username,
-                "total_amount": float(o.total_amount),
-                "details": [dict(d._mapping) for d in details]
-            })
+            item = {f: _ORDER_FIELDS[f](getattr(o, f)) for f in fields}
+            if with_details:
+                item["details"] = details.get((o.src, o.detail_order_id), [])
+            result.append(item)
 
-        return {"code": 200, "msg": "Success.", "data": {"list": result}}, 200
+        data = {"list": result}
+        if start is None:
+            watermark = archived_before(SALES)
+            if watermark is not None:
+                data["archived_before"] = watermark.isoformat()
+        return {"code": 200, "msg": "Success.", "data": data}, 200
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
     
@@ -77,7 +141,7 @@ def generate_order_id():
 @order_bp.route('/insert', methods=['POST'])
 def order_insert():
     data = request.get_json()
-    user_id = data.get('user_id')
+    user_id = current_user_id(data)
     details = data.get('details', [])
     
     if not user_id or not details:
@@ -87,14 +151,18 @@ def order_insert():
         # 生成唯一订单ID
         order_id = generate_order_id()
         
-        # 创建订单
+        # 创建订单（本接口不写明细行，汇总列为 0）
         db.session.execute(
-            text("INSERT INTO t_order (order_id, order_time, user_id) VALUES (:order_id, NOW(), :user_id)"),
+            text("""
+                INSERT INTO t_order (order_id, order_time, user_id, total_amount, line_count)
+                VALUES (:order_id, NOW(), :user_id, 0, 0)
+            """),
             {"order_id": order_id, "user_id": user_id}
         )
         
         
         db.session.commit()
+        publish('order', {"order_id": order_id, "user_id": user_id, "total_items": len(details)})
         return {
             "code": 200, 
             "msg": "成功",
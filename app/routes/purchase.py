@@ -1,37 +1,88 @@
 from flask import Blueprint, request
 from sqlalchemy import text
 from app.db import db
+from app.auth import public, current_user_id
+from app.supply_index import best_supply
+from app.archive import PURCHASES, archived_before, history_range, purchase_sources, range_condition
+from app.events import publish
+from app.contention import ContentionError, contention_response, tx_retry
+from app.projection import parse_fields, select_list
 
 purchase_bp = Blueprint('purchase', __name__)
 
 @purchase_bp.route('/')
+@public
 def purchase_hello():
     """测试 purchase 蓝图是否生效"""
     return 'Purchase module OK'
 
    
 # ========== 进货记录视图接口 ==========
+# 可投影的字段：SQL 表达式与需要关联的表
+_PURCHASE_FIELDS = {
+    'purchase_id': ('p.purchase_id', None),
+    'purchase_time': ('p.purchase_time', None),
+    'supplier_id': ('p.supplier_id', None),
+    'supplier_name': ('sp.supplier_name', 'sp'),
+    'isbn': ('p.isbn', None),
+    'title': ('b.title', 'b'),
+    'purchase_qty': ('p.purchase_qty', None),
+    'purchase_price': ('p.purchase_price', None),
+    'user_id': ('p.user_id', None),
+    'username': ('u.username', 'u'),
+}
+_PURCHASE_JOINS = {
+    'sp': ('supplier_id', "INNER JOIN t_supplier sp ON sp.supplier_id = p.supplier_id"),
+    'b': ('isbn', "INNER JOIN t_book b ON b.isbn = p.isbn"),
+    'u': ('user_id', "INNER JOIN t_user u ON u.user_id = p.user_id"),
+}
+_PURCHASE_COLUMNS = ('purchase_id', 'purchase_time', 'supplier_id', 'isbn', 'purchase_qty', 'purchase_price', 'user_id')
+
+
 @purchase_bp.route('/select', methods=['GET'])
 def purchase_select():
+    """
+    进货记录，按时间倒序。可选 from/to（YYYY-MM-DD）限定时间范围；
+    不给 from 时只查热表，from 早于归档水位时才合并读取归档表；
+    只查热表且已有归档时返回 archived_before，提示更早的记录需用 from 查询。
+    fields（逗号分隔）只查询并返回指定字段，未用到的关联表不参与查询。
+    """
+    try:
+        start, end = history_range(request.args)
+    except ValueError as e:
+        return {"code": 400, "msg": f"from/to参数错误: {e}"}, 400
     try:
-        rows = db.session.execute(text("""
-            SELECT purchase_id, purchase_time,
-                   supplier_id, supplier_name,
-                   isbn, title,
-                   purchase_qty, purchase_price,
-                   user_id, username
-            FROM v_purchase_record
-            ORDER BY purchase_time DESC
-        """)).fetchall()
+        fields = parse_fields(request.args, tuple(_PURCHASE_FIELDS))
+    except ValueError as e:
+        return {"code": 400, "msg": f"fields参数错误: {e}"}, 400
 
-        return {
-            "code": 200,
-            "msg": "Success.",
-            "data": {
-                "count": len(rows),
-                "list": [dict(row._mapping) for row in rows]
-            }
-        }, 200
+    joins = [alias for alias in _PURCHASE_JOINS if any(_PURCHASE_FIELDS[f][1] == alias for f in fields)]
+    needed = {'purchase_time'} | {f for f in fields if _PURCHASE_FIELDS[f][1] is None}
+    needed |= {_PURCHASE_JOINS[alias][0] for alias in joins}
+    columns = ', '.join(c for c in _PURCHASE_COLUMNS if c in needed)
+
+    try:
+        purchases = " UNION ALL ".join(
+            f"""SELECT {columns}
+                FROM {table} WHERE {range_condition('purchase_time', start, end)}"""
+            for table in purchase_sources(start)
+        )
+        rows = db.session.execute(text(f"""
+            SELECT {select_list({f: expr for f, (expr, _) in _PURCHASE_FIELDS.items()}, fields)}
+            FROM ({purchases}) p
+            {' '.join(_PURCHASE_JOINS[alias][1] for alias in joins)}
+            ORDER BY p.purchase_time DESC
+        """), {"start": start, "end": end}).fetchall()
+
+        data = {
+            "count": len(rows),
+            "list": [dict(row._mapping) for row in rows]
+        }
+        if start is None:
+            watermark = archived_before(PURCHASES)
+            if watermark is not None:
+                data["archived_before"] = watermark.isoformat()
+        return {"code": 200, "msg": "Success.", "data": data}, 200
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
     
@@ -42,7 +93,9 @@ def purchase_select():
 def purchase_insert():
     """
     登记进货接口
-    请求 JSON: { "supplier_id": int, "isbn": str, "purchase_qty": int, "user_id": int }
+    请求 JSON: { "supplier_id": int | "auto", "isbn": str, "purchase_qty": int }
+    supplier_id 为 "auto" 时按最低供货价自动选择供应商
+    经手人取自令牌对应的用户
     返回: {"code":200, "msg":"成功"} 或 错误信息
     """
     try:
@@ -50,14 +103,16 @@ def purchase_insert():
         supplier_id = data.get("supplier_id")
         isbn = data.get("isbn")
         purchase_qty = data.get("purchase_qty")
-        user_id = data.get("user_id")
+        user_id = current_user_id(data)
 
         # 参数校验
         if not all([supplier_id, isbn, purchase_qty, user_id]):
             return {"code": 400, "msg": "缺少必填参数: supplier_id, isbn, purchase_qty, user_id"}, 201
 
+        auto_supplier = supplier_id == 'auto'
         try:
-            supplier_id = int(supplier_id)
+            if not auto_supplier:
+                supplier_id = int(supplier_id)
             purchase_qty = int(purchase_qty)
             user_id = int(user_id)
         except ValueError:
@@ -66,37 +121,45 @@ def purchase_insert():
         if purchase_qty <= 0:
             return {"code": 400, "msg": "purchase_qty 必须大于0"}, 201
 
-        # 1. 获取供货价（优先 t_supply_info）
-        row = db.session.execute(
-            text("SELECT supply_price FROM t_supply_info WHERE supplier_id = :sid AND isbn = :isbn"),
-            {"sid": supplier_id, "isbn": isbn}
-        ).fetchone()
-
-        if row and row[0] is not None:
-            purchase_price = row[0]
+        # 1. 获取供货价：auto 时直接取最低价索引，否则优先 t_supply_info
+        if auto_supplier:
+            best = best_supply(isbn)
+            if not best:
+                return {"code": 400, "msg": "该图书暂无供货报价，无法自动选择供应商"}, 201
+            supplier_id, purchase_price = best
         else:
-            # 回退到图书定价
-            row2 = db.session.execute(
-                text("SELECT price FROM t_book WHERE isbn = :isbn"),
-                {"isbn": isbn}
+            row = db.session.execute(
+                text("SELECT supply_price FROM t_supply_info WHERE supplier_id = :sid AND isbn = :isbn"),
+                {"sid": supplier_id, "isbn": isbn}
             ).fetchone()
-            if row2 and row2[0] is not None:
-                purchase_price = row2[0]
+
+            if row and row[0] is not None:
+                purchase_price = row[0]
             else:
-                return {"code": 400, "msg": "未找到供货价或图书定价，无法确定进货价格"}, 201
-
-        # 2. 调用存储过程
-        db.session.execute(
-            text("CALL proc_purchase_book(:supplier_id, :isbn, :qty, :price, :user_id)"),
-            {
-                "supplier_id": supplier_id,
-                "isbn": isbn,
-                "qty": purchase_qty,
-                "price": purchase_price,
-                "user_id": user_id
-            }
-        )
-        db.session.commit()
+                # 回退到图书定价
+                row2 = db.session.execute(
+                    text("SELECT price FROM t_book WHERE isbn = :isbn"),
+                    {"isbn": isbn}
+                ).fetchone()
+                if row2 and row2[0] is not None:
+                    purchase_price = row2[0]
+                else:
+                    return {"code": 400, "msg": "未找到供货价或图书定价，无法确定进货价格"}, 201
+
+        # 2. 调用存储过程；死锁、锁等待超时时整体重做
+        def work():
+            db.session.execute(
+                text("CALL proc_purchase_book(:supplier_id, :isbn, :qty, :price, :user_id)"),
+                {
+                    "supplier_id": supplier_id,
+                    "isbn": isbn,
+                    "qty": purchase_qty,
+                    "price": purchase_price,
+                    "user_id": user_id
+                }
+            )
+
+        tx_retry.run('purchase', work)
 
         #查询最新库存和最近进货记录，用于调试
         stock_row = db.session.execute(
@@ -114,15 +177,24 @@ def purchase_insert():
             {"isbn": isbn}
         ).fetchone()
 
+        latest_purchase = dict(purchase_row._mapping) if purchase_row else None
+        publish('purchase', latest_purchase or {
+            "supplier_id": supplier_id, "isbn": isbn, "purchase_qty": purchase_qty, "user_id": user_id
+        })
+        if stock_row:
+            publish('stock', [{"isbn": isbn, "quantity": stock_row[0]}])
+
         return {
             "code": 200,
             "msg": "成功",
             "data": {
                 "new_stock": stock_row[0] if stock_row else None,
-                "latest_purchase": dict(purchase_row._mapping) if purchase_row else None
+                "latest_purchase": latest_purchase
             }
         }, 200
 
+    except ContentionError as e:
+        return contention_response(e)
     except Exception as e:
         try:
             db.session.rollback()
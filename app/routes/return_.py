@@ -1,57 +1,126 @@
 from flask import Blueprint, request
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 import random, time
 from datetime import datetime
 from app.db import db
+from app.auth import public, current_user_id
+from app.totals import refresh_totals
+from app.archive import SALES, archived_before, history_range, range_condition, return_sources
+from app.bulk import chunked
+from app.ranking import invalidate_snapshots
+from app.events import publish, publish_stock
+from app.projection import parse_fields, parse_flag
+from app.contention import ContentionError, contention_response, tx_retry
 
 return_bp = Blueprint('return', __name__)
 
 @return_bp.route('/')
+@public
 def return_hello():
     """测试 return 蓝图是否生效"""
     return 'return module OK'
 
     
 # ========== 退货订单视图接口 ==========
+# 可投影的字段及其输出格式；username 需关联 t_user
+_RETURN_FIELDS = {
+    'return_id': lambda value: value,
+    'order_id': lambda value: value,
+    'return_time': lambda value: value.isoformat(),
+    'reason': lambda value: value,
+    'user_id': lambda value: value,
+    'username': lambda value: value,
+    'total_amount': lambda value: float(value),
+}
+
+
+def _return_details(sources, returns, chunk_size=1000):
+    """按数据源批量取退货明细及原订单成交价（每块 chunk_size 个退货单一条 IN 查询）：{(数据源编号, return_id): [明细]}"""
+    details = {}
+    for src, (return_table, detail_table, order_detail_table) in enumerate(sources):
+        return_ids = [r.detail_return_id for r in returns if r.src == src]
+        stmt = text(f"""
+            SELECT
+                rd.return_id,
+                rd.isbn,
+                b.title,
+                b.author,
+                b.publisher,
+                od.order_price AS refund_price,
+                rd.return_qty
+            FROM {detail_table} rd
+            INNER JOIN {return_table} rr ON rr.return_id = rd.return_id
+            INNER JOIN t_book b ON rd.isbn = b.isbn
+            INNER JOIN {order_detail_table} od
+                ON rd.isbn = od.isbn AND od.order_id = rr.order_id
+            WHERE rr.return_id IN :rids
+        """).bindparams(bindparam('rids', expanding=True))
+        for part in chunked(return_ids, chunk_size):
+            for d in db.session.execute(stmt, {"rids": part}).mappings():
+                detail = dict(d)
+                details.setdefault((src, detail.pop('return_id')), []).append(detail)
+    return details
+
+
 @return_bp.route('/select', methods=['GET'])
 def return_select():
+    """
+    退货记录，按时间倒序。可选 from/to（YYYY-MM-DD）限定时间范围；
+    不给 from 时只查热表，from 早于归档水位时才合并读取归档表；
+    只查热表且已有归档时返回 archived_before，提示更早的记录需用 from 查询。
+    fields（逗号分隔）只查询并返回指定字段；details=false 时不查询明细。
+    """
+    try:
+        start, end = history_range(request.args)
+    except ValueError as e:
+        return {"code": 400, "msg": f"from/to参数错误: {e}"}, 400
+    try:
+        fields = parse_fields(request.args, tuple(_RETURN_FIELDS))
+        with_details = parse_flag(request.args, 'details')
+    except ValueError as e:
+        return {"code": 400, "msg": f"fields/details参数错误: {e}"}, 400
+
+    # 内层只取用到的列：排序用的 return_time、关联 t_user 的 user_id、查明细用的退货单号
+    needed = {'return_time'} | {f for f in fields if f != 'username'}
+    if 'username' in fields:
+        needed.add('user_id')
+    if with_details:
+        needed.add('return_id')
+    columns = [
+        c for c in ('return_id', 'order_id', 'return_time', 'reason', 'user_id', 'total_amount') if c in needed
+    ]
+    outer = [f"r.{f}" if f != 'username' else "u.username" for f in fields]
+    if with_details:
+        outer += ["r.return_id AS detail_return_id", "r.src"]
+
     try:
-        returns = db.session.execute(text("""
-            SELECT return_id, order_id, return_time, reason,
-                   user_id, username, total_amount
-            FROM v_return_records
-            ORDER BY return_time DESC
-        """)).fetchall()
+        sources = return_sources(start)
+        headers = " UNION ALL ".join(
+            f"""SELECT {', '.join(columns)}, {i} AS src
+                FROM {return_table} WHERE {range_condition('return_time', start, end)}"""
+            for i, (return_table, _, _) in enumerate(sources)
+        )
+        returns = db.session.execute(text(f"""
+            SELECT {', '.join(outer)}
+            FROM ({headers}) r
+            {"INNER JOIN t_user u ON u.user_id = r.user_id" if 'username' in fields else ""}
+            ORDER BY r.return_time DESC
+        """), {"start": start, "end": end}).fetchall()
 
+        details = _return_details(sources, returns) if with_details else None
         result = []
         for r in returns:
-            details = db.session.execute(text("""
-                SELECT
-                    rd.isbn,
-                    b.title,
-                    b.author,
-                    b.publisher,
-                    od.order_price AS refund_price,
-                    rd.return_qty
-                FROM t_return_detail rd
-                INNER JOIN t_book b ON rd.isbn = b.isbn
-                INNER JOIN t_order_detail od
-                    ON rd.isbn = od.isbn AND od.order_id = :oid
-                WHERE rd.return_id = :rid
-            """), {"rid": r.return_id, "oid": r.order_id}).fetchall()
-
-            result.append({
-                "return_id": r.return_id,
-                "order_id": r.order_id,
-                "return_time": r.return_time.isoformat(),
-                "reason": r.reason,
-                "user_id": r.user_id,
-                "username": r.username,
-                "total_amount": float(r.total_amount),
-                "details": [dict(d._mapping) for d in details]
-            })
-
-        return {"code": 200, "msg": "Success.", "data": {"list": result}}, 200
+            item = {f: _RETURN_FIELDS[f](getattr(r, f)) for f in fields}
+            if with_details:
+                item["details"] = details.get((r.src, r.detail_return_id), [])
+            result.append(item)
+
+        data = {"list": result}
+        if start is None:
+            watermark = archived_before(SALES)
+            if watermark is not None:
+                data["archived_before"] = watermark.isoformat()
+        return {"code": 200, "msg": "Success.", "data": data}, 200
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
     
@@ -73,27 +142,34 @@ def generate_return_id():
 def return_insert():
     data = request.get_json(silent=True) or {}
     order_id = data.get('order_id')
-    user_id = data.get('user_id')
+    user_id = current_user_id(data)
     reason = data.get('reason', '')
     details = data.get('details', [])
 
     if not order_id or not user_id or not details:
         return {"code": 400, "msg": "order_id, user_id, and details are required"}, 400
 
-    try:
-        for item in details:
-            isbn = item.get('isbn')
-            return_qty = item.get('return_qty')
-
-            if not isbn or return_qty is None:
-                return {"code": 400, "msg": "Each detail must contain isbn and return_qty"}, 400
-            try:
-                return_qty = int(return_qty)
-            except (TypeError, ValueError):
-                return {"code": 400, "msg": "return_qty must be an integer"}, 400
-            if return_qty <= 0:
-                return {"code": 400, "msg": "return_qty must be > 0"}, 400
+    lines = []
+    for item in details:
+        item = item if isinstance(item, dict) else {}
+        isbn = item.get('isbn')
+        return_qty = item.get('return_qty')
+
+        if not isbn or return_qty is None:
+            return {"code": 400, "msg": "Each detail must contain isbn and return_qty"}, 400
+        try:
+            return_qty = int(return_qty)
+        except (TypeError, ValueError):
+            return {"code": 400, "msg": "return_qty must be an integer"}, 400
+        if return_qty <= 0:
+            return {"code": 400, "msg": "return_qty must be > 0"}, 400
+        lines.append((isbn, return_qty))
+    # 按 ISBN 顺序加锁，并发退货（及进货）对同一批库存行的加锁顺序一致，减少死锁
+    lines.sort(key=lambda line: line[0])
 
+    def work():
+        return_ids = []
+        for isbn, return_qty in lines:
             # 生成唯一退货单ID
             return_id = generate_return_id()
 
@@ -109,8 +185,28 @@ def return_insert():
                     "user_id": user_id
                 }
             )
+            return_ids.append(return_id)
 
-        db.session.commit()
+        # 同一事务内回填退货单汇总列，并作废原订单所在日/月的排行快照
+        refresh_totals('t_return', return_ids)
+        order_time = db.session.execute(
+            text("SELECT order_time FROM t_order WHERE order_id = :oid"), {"oid": order_id}
+        ).scalar()
+        if order_time is not None:
+            invalidate_snapshots([order_time])
+        return return_ids
+
+    try:
+        # 死锁、锁等待超时时整体重做（重新生成退货单ID）
+        return_ids = tx_retry.run('return', work)
+        publish('return', {
+            "order_id": order_id,
+            "return_ids": return_ids,
+            "user_id": user_id,
+            "reason": reason,
+            "details": [{"isbn": isbn, "return_qty": return_qty} for isbn, return_qty in lines],
+        })
+        publish_stock(isbn for isbn, _ in lines)
         return {
             "code": 200,
             "msg": "成功",
@@ -121,6 +217,8 @@ def return_insert():
             }
         }, 200
 
+    except ContentionError as e:
+        return contention_response(e)
     except Exception as e:
         db.session.rollback()
         err_text = str(e)
@@ -1,11 +1,23 @@
-from flask import Blueprint, request
+from flask import Blueprint, Response, current_app, make_response, request
 from sqlalchemy import text
-from datetime import datetime
-from app.db import db
+from datetime import datetime, timedelta
+import numpy as np
+from app.db import db, in_read_snapshot
+from app.auth import public, token_in_query
+from app.single_flight import single_flight
+from app.result_cache import result_cache
+from app.contention import tx_retry
+from app.archive import history_range, order_sources, return_sources
+from app.purchase_rollup import GROUPS, build_rollup, pending_months, purchase_summary
+from app.ranking import DAILY, MONTHLY, ranking
+from app.admission import admission
+from app.events import broker, iter_stream
+from app.projection import parse_fields
 
 statistic_bp = Blueprint('statistic', __name__)
 
 @statistic_bp.route('/')
+@public
 def statistic_hello():
     """测试 statistic 蓝图是否生效"""
     return 'statistic module OK'
@@ -13,11 +25,20 @@ def statistic_hello():
 
 
 # ========== 图书库存视图接口 ==========
+STOCK_FIELDS = ('isbn', 'title', 'author', 'publisher', 'price', 'quantity')
+
+
 @statistic_bp.route('/stock/select', methods=['GET'])
 def stock_select():
+    """图书库存，按库存升序。参数: fields（逗号分隔，可选 isbn,title,author,publisher,price,quantity）"""
     try:
-        rows = db.session.execute(text("""
-            SELECT isbn, title, author, publisher, price, quantity
+        fields = parse_fields(request.args, STOCK_FIELDS)
+    except ValueError as e:
+        return {"code": 400, "msg": f"fields参数错误: {e}"}, 400
+
+    try:
+        rows = db.session.execute(text(f"""
+            SELECT {', '.join(fields)}
             FROM v_book_inventory
             ORDER BY quantity ASC
         """)).fetchall()
@@ -55,11 +76,37 @@ def stock_shortage():
         return {"code": 400, "msg": f"Fail.Reason:{e}"}, 201
     
 
+# ========== 排行快照 ==========
+def _rank_response(entries, source, sort_by, limit):
+    """按 sort_by 排序取前 limit 名；来自已结束期间（快照）的结果带 ETag，客户端每次验证（快照被作废后即可拿到新结果）"""
+    key_map = {
+        "qty": lambda x: x['total_sold_qty'],
+        "amount": lambda x: x['total_sales_amount']
+    }
+    ranked = []
+    for idx, item in enumerate(sorted(entries, key=key_map[sort_by], reverse=True)[:limit], start=1):
+        ranked.append({**item, "rank": idx})
+
+    response = make_response({
+        "code": 200,
+        "msg": "成功",
+        "data": {
+            "count": len(ranked),
+            "list": ranked
+        }
+    }, 200)
+    if source is not None:
+        response.headers['Cache-Control'] = "private, no-cache"
+        response.headers['X-Rank-Snapshot'] = source
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
 # ========== 日榜接口 ==========
 @statistic_bp.route('/sales/rank/daily', methods=['GET'])
 def daily_rank():
     from datetime import datetime
-    from decimal import Decimal
 
     date_str = request.args.get('date')
     limit = request.args.get('limit', 10, type=int)
@@ -69,7 +116,7 @@ def daily_rank():
         return {"code": 400, "msg": "date参数必填"}, 400
 
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
+        day = datetime.strptime(date_str, '%Y-%m-%d')
     except ValueError:
         return {"code": 400, "msg": "date参数格式应为YYYY-MM-DD"}, 400
 
@@ -77,65 +124,8 @@ def daily_rank():
         return {"code": 400, "msg": "sort_by参数只能是qty或amount"}, 400
 
     try:
-        rows = db.session.execute(
-            text("CALL proc_daily_rank(:p_date)"),
-            {"p_date": date_str}
-        ).mappings().all()
-
-        if not rows:
-            return {
-                "code": 200,
-                "msg": "成功",
-                "data": {"count": 0, "list": []}
-            }, 200
-
-        data_list = []
-
-        for row in rows:
-            book = db.session.execute(
-                text("""
-                    SELECT author, publisher, price
-                    FROM t_book
-                    WHERE isbn = :isbn
-                """),
-                {"isbn": row['isbn']}
-            ).mappings().first()
-
-            total_sales_amount = Decimal('0.00')
-            if book and book['price'] is not None:
-                total_sales_amount = Decimal(row['total_sold']) * book['price']
-
-            data_list.append({
-                "isbn": row['isbn'],
-                "title": row['title'],
-                "author": book['author'] if book else None,
-                "publisher": book['publisher'] if book else None,
-                "price": float(book['price']) if book else None,
-                "total_sold_qty": row['total_sold'],
-                "total_sales_amount": float(total_sales_amount)
-            })
-
-        # 排序
-        key_map = {
-            "qty": lambda x: x['total_sold_qty'],
-            "amount": lambda x: x['total_sales_amount']
-        }
-        data_list.sort(key=key_map[sort_by], reverse=True)
-
-        ranked = []
-        for idx, item in enumerate(data_list[:limit], start=1):
-            item['rank'] = idx
-            ranked.append(item)
-
-        return {
-            "code": 200,
-            "msg": "成功",
-            "data": {
-                "count": len(ranked),
-                "list": ranked
-            }
-        }, 200
-
+        entries, source = ranking(DAILY, day, current_app.config.get('RANK_SNAPSHOT_ENABLED', True))
+        return _rank_response(entries, source, sort_by, limit)
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 400
 
@@ -143,7 +133,6 @@ def daily_rank():
 @statistic_bp.route('/sales/rank/monthly', methods=['GET'])
 def monthly_rank():
     import re
-    from decimal import Decimal
 
     month_str = request.args.get('month')
     limit = request.args.get('limit', 10, type=int)
@@ -161,64 +150,393 @@ def monthly_rank():
     year, month = map(int, month_str.split('-'))
 
     try:
+        entries, source = ranking(MONTHLY, datetime(year, month, 1), current_app.config.get('RANK_SNAPSHOT_ENABLED', True))
+        return _rank_response(entries, source, sort_by, limit)
+    except Exception as e:
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 400
+
+
+# ========== 销售时间序列接口 ==========
+_SERIES_BUCKETS = {
+    'hour': np.timedelta64(1, 'h'),
+    'day': np.timedelta64(1, 'D'),
+    'week': np.timedelta64(7, 'D'),
+}
+_SERIES_MAX_BUCKETS = 10000
+
+
+def _window_buckets(days, width):
+    """把按天计的移动平均窗口换算为桶数"""
+    return max(1, int(round(np.timedelta64(days, 'D') / width)))
+
+
+def _moving_average(values, window):
+    """尾随窗口均值，前部不足 window 个桶时按已有桶数平均"""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    idx = np.arange(1, len(values) + 1)
+    lo = np.maximum(idx - window, 0)
+    return (csum[idx] - csum[lo]) / (idx - lo)
+
+
+@statistic_bp.route('/sales/series', methods=['GET'])
+def sales_series():
+    """
+    销售时间序列：一次查询取出区间内的订单与退货，用 NumPy 按桶聚合。
+    按天/周统计时数据库先按日期汇总，按小时统计时按单据汇总，以减少传回的行数。
+    参数: from, to (YYYY-MM-DD, 含两端), granularity=hour|day|week (默认 day), isbn (可选)
+    """
+    from_str = request.args.get('from')
+    to_str = request.args.get('to')
+    granularity = request.args.get('granularity', 'day')
+    isbn = request.args.get('isbn') or None
+
+    if not from_str or not to_str:
+        return {"code": 400, "msg": "from和to参数必填"}, 400
+    try:
+        start = datetime.strptime(from_str, '%Y-%m-%d')
+        end = datetime.strptime(to_str, '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        return {"code": 400, "msg": "from/to参数格式应为YYYY-MM-DD"}, 400
+    if end <= start:
+        return {"code": 400, "msg": "to不能早于from"}, 400
+    if granularity not in _SERIES_BUCKETS:
+        return {"code": 400, "msg": "granularity参数只能是hour、day或week"}, 400
+
+    width = _SERIES_BUCKETS[granularity]
+    if granularity == 'week':
+        start -= timedelta(days=start.weekday())
+    start64 = np.datetime64(start, 'us')
+    n_buckets = int(np.ceil((np.datetime64(end, 'us') - start64) / width))
+    if n_buckets > _SERIES_MAX_BUCKETS:
+        return {"code": 400, "msg": f"时间范围过大，最多{_SERIES_MAX_BUCKETS}个时间桶"}, 400
+
+    # 向前多取 30 天，使区间开头的移动平均也是完整窗口
+    ma7 = _window_buckets(7, width)
+    ma30 = _window_buckets(30, width)
+    lookback = ma30 - 1
+    query_start64 = start64 - lookback * width
+    total_buckets = lookback + n_buckets
+    if granularity == 'hour':
+        order_key, return_key = "o.order_time", "r.return_time"
+        order_group, return_group = "o.order_id, o.order_time", "r.return_id, r.return_time"
+    else:
+        order_key = order_group = "DATE(o.order_time)"
+        return_key = return_group = "DATE(r.return_time)"
+
+    try:
+        query_start = query_start64.astype(datetime)
+        # 区间触及归档表时每个数据源各一组分支，同一时间桶的多行由 bincount 合并
+        branches = [f"""
+            SELECT {order_key} AS ts,
+                   SUM(od.order_qty) AS qty,
+                   SUM(od.order_qty * od.order_price) AS amount,
+                   0 AS is_return
+            FROM {order_table} o
+            INNER JOIN {detail_table} od ON od.order_id = o.order_id
+            WHERE o.order_time >= :start AND o.order_time < :end
+              {"AND od.isbn = :isbn" if isbn else ""}
+            GROUP BY {order_group}
+        """ for order_table, detail_table in order_sources(query_start)]
+        branches += [f"""
+            SELECT {return_key} AS ts,
+                   SUM(rd.return_qty) AS qty,
+                   SUM(rd.return_qty * od.order_price) AS amount,
+                   1 AS is_return
+            FROM {return_table} r
+            INNER JOIN {return_detail_table} rd ON rd.return_id = r.return_id
+            INNER JOIN {order_detail_table} od ON od.order_id = r.order_id AND od.isbn = rd.isbn
+            WHERE r.return_time >= :start AND r.return_time < :end
+              {"AND rd.isbn = :isbn" if isbn else ""}
+            GROUP BY {return_group}
+        """ for return_table, return_detail_table, order_detail_table in return_sources(query_start)]
         rows = db.session.execute(
-            text("CALL proc_monthly_rank(:p_year, :p_month)"),
-            {"p_year": year, "p_month": month}
-        ).mappings().all()
+            text(" UNION ALL ".join(branches)), {"start": query_start, "end": end, "isbn": isbn}
+        ).fetchall()
+
+        count = len(rows)
+        ts = np.array([r[0] for r in rows], dtype='datetime64[us]') if count else np.empty(0, 'datetime64[us]')
+        qty = np.fromiter((r[1] or 0 for r in rows), dtype=np.float64, count=count)
+        amount = np.fromiter((float(r[2] or 0) for r in rows), dtype=np.float64, count=count)
+        is_return = np.fromiter((r[3] for r in rows), dtype=bool, count=count)
+
+        bucket = ((ts - query_start64) // width).astype(np.int64)
+        sales, returns = ~is_return, is_return
+        units = np.bincount(bucket[sales], weights=qty[sales], minlength=total_buckets)
+        revenue = np.bincount(bucket[sales], weights=amount[sales], minlength=total_buckets)
+        return_units = np.bincount(bucket[returns], weights=qty[returns], minlength=total_buckets)
+        return_amount = np.bincount(bucket[returns], weights=amount[returns], minlength=total_buckets)
+        net_units = units - return_units
+        net_revenue = revenue - return_amount
+
+        visible = slice(lookback, total_buckets)
+        labels = start64 + np.arange(n_buckets) * width
+
+        def series(values):
+            return np.round(values[visible], 2).tolist()
 
-        if not rows:
-            return {
-                "code": 200,
-                "msg": "成功",
-                "data": {"count": 0, "list": []}
-            }, 200
+        return {
+            "code": 200,
+            "msg": "成功",
+            "data": {
+                "granularity": granularity,
+                "isbn": isbn,
+                "count": n_buckets,
+                "buckets": [str(label)[:19] for label in labels.astype('datetime64[s]')],
+                "units": series(units),
+                "revenue": series(revenue),
+                "return_units": series(return_units),
+                "return_amount": series(return_amount),
+                "net_units": series(net_units),
+                "net_revenue": series(net_revenue),
+                "ma7_net_units": series(_moving_average(net_units, ma7)),
+                "ma30_net_units": series(_moving_average(net_units, ma30)),
+                "ma7_net_revenue": series(_moving_average(net_revenue, ma7)),
+                "ma30_net_revenue": series(_moving_average(net_revenue, ma30)),
+            }
+        }, 200
 
-        data_list = []
+    except Exception as e:
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 400
 
-        for row in rows:
-            book = db.session.execute(
-                text("""
-                    SELECT author, publisher, price
-                    FROM t_book
-                    WHERE isbn = :isbn
-                """),
-                {"isbn": row['isbn']}
-            ).mappings().first()
 
-            total_sales_amount = Decimal('0.00')
-            if book and book['price'] is not None:
-                total_sales_amount = Decimal(row['total_sold']) * book['price']
+# ========== 补货建议接口 ==========
+def _positions(sorted_keys, keys):
+    """在已排序的 sorted_keys 中定位 keys，返回 (下标, 是否存在)"""
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, max(len(sorted_keys) - 1, 0))
+    found = sorted_keys[pos] == keys if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+    return pos, found
+
+
+@statistic_bp.route('/reorder/plan', methods=['GET'])
+def reorder_plan():
+    """
+    全品种补货建议：按近 window 天净销量算日均速度，结合库存算可售天数，
+    按 (到货周期 + 目标覆盖天数) 算建议补货量，并从 t_supply_best 给出报价最低的供应商。
+    全部计算在 NumPy 数组上完成，SQL 条数与品种数无关。
+    参数: window (默认30), lead_time (默认7), cover_days (默认30), limit (默认200)
+    """
+    window = request.args.get('window', 30, type=int)
+    lead_time = request.args.get('lead_time', 7, type=int)
+    cover_days = request.args.get('cover_days', 30, type=int)
+    limit = request.args.get('limit', 200, type=int)
+
+    if not 1 <= window <= 365:
+        return {"code": 400, "msg": "window参数范围为1~365"}, 400
+    if lead_time < 0 or cover_days < 0:
+        return {"code": 400, "msg": "lead_time和cover_days不能为负数"}, 400
+    if limit <= 0 or limit > 100000:
+        limit = 200
+
+    since = datetime.now() - timedelta(days=window)
 
+    try:
+        books = db.session.execute(text("""
+            SELECT isbn, title, quantity FROM v_book_inventory
+        """)).fetchall()
+        if not books:
+            return {"code": 200, "msg": "成功", "data": {"count": 0, "list": []}}, 200
+
+        # CROSS JOIN 在 SQLite 中固定以 t_order 为驱动表走 idx_order_time，MySQL 中等同 INNER JOIN；
+        # 窗口触及归档表时逐个数据源汇总，同一 ISBN 的多行由 np.add.at 合并
+        sold, returned = [], []
+        for order_table, detail_table in order_sources(since):
+            sold += db.session.execute(text(f"""
+                SELECT od.isbn, SUM(od.order_qty) AS qty
+                FROM {order_table} o
+                CROSS JOIN {detail_table} od ON od.order_id = o.order_id
+                WHERE o.order_time >= :since
+                GROUP BY od.isbn
+            """), {"since": since}).fetchall()
+        for return_table, return_detail_table, _ in return_sources(since):
+            returned += db.session.execute(text(f"""
+                SELECT rd.isbn, SUM(rd.return_qty) AS qty
+                FROM {return_table} r
+                CROSS JOIN {return_detail_table} rd ON rd.return_id = r.return_id
+                WHERE r.return_time >= :since
+                GROUP BY rd.isbn
+            """), {"since": since}).fetchall()
+        supply = db.session.execute(text("""
+            SELECT isbn, best_supplier_id, best_price FROM t_supply_best
+        """)).fetchall()
+        supplier_names = dict(db.session.execute(text("""
+            SELECT supplier_id, supplier_name FROM t_supplier
+        """)).fetchall())
+
+        # 目录按 ISBN 排序，其余结果集通过 searchsorted 映射到目录下标
+        isbns = np.array([r[0] for r in books])
+        order = np.argsort(isbns)
+        isbns = isbns[order]
+        titles = np.array([r[1] for r in books], dtype=object)[order]
+        stock = np.array([r[2] or 0 for r in books], dtype=np.int64)[order]
+        n = len(isbns)
+
+        net_sold = np.zeros(n, dtype=np.int64)
+        for rows, sign in ((sold, 1), (returned, -1)):
+            if rows:
+                pos, found = _positions(isbns, np.array([r[0] for r in rows]))
+                qty = np.array([int(r[1] or 0) for r in rows], dtype=np.int64)
+                np.add.at(net_sold, pos[found], sign * qty[found])
+        net_sold = np.maximum(net_sold, 0)
+
+        best_supplier = np.full(n, -1, dtype=np.int64)
+        best_price = np.full(n, np.nan)
+        if supply:
+            pos, found = _positions(isbns, np.array([r[0] for r in supply]))
+            best_supplier[pos[found]] = np.array([r[1] for r in supply], dtype=np.int64)[found]
+            best_price[pos[found]] = np.array([float(r[2]) for r in supply])[found]
+
+        velocity = net_sold / window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_of_cover = np.where(velocity > 0, stock / velocity, np.inf)
+        target = np.ceil(velocity * (lead_time + cover_days)).astype(np.int64)
+        recommended = np.maximum(target - stock, 0)
+
+        need = np.flatnonzero(recommended > 0)
+        need = need[np.argsort(days_of_cover[need], kind='stable')]
+        estimated_cost = np.where(np.isnan(best_price), 0.0, best_price) * recommended
+
+        data_list = []
+        for i in need[:limit]:
+            supplier_id = int(best_supplier[i]) if best_supplier[i] >= 0 else None
             data_list.append({
-                "isbn": row['isbn'],
-                "title": row['title'],
-                "author": book['author'] if book else None,
-                "publisher": book['publisher'] if book else None,
-                "price": float(book['price']) if book else None,
-                "total_sold_qty": row['total_sold'],
-                "total_sales_amount": float(total_sales_amount)
+                "isbn": isbns[i],
+                "title": titles[i],
+                "quantity": int(stock[i]),
+                "sold_qty": int(net_sold[i]),
+                "daily_velocity": round(float(velocity[i]), 3),
+                "days_of_cover": round(float(days_of_cover[i]), 1),
+                "recommended_qty": int(recommended[i]),
+                "supplier_id": supplier_id,
+                "supplier_name": supplier_names.get(supplier_id),
+                "supply_price": None if np.isnan(best_price[i]) else round(float(best_price[i]), 2),
+                "estimated_cost": round(float(estimated_cost[i]), 2),
             })
 
-        # 排序
-        key_map = {
-            "qty": lambda x: x['total_sold_qty'],
-            "amount": lambda x: x['total_sales_amount']
-        }
-        data_list.sort(key=key_map[sort_by], reverse=True)
-
-        ranked = []
-        for idx, item in enumerate(data_list[:limit], start=1):
-            item['rank'] = idx
-            ranked.append(item)
-
         return {
             "code": 200,
             "msg": "成功",
             "data": {
-                "count": len(ranked),
-                "list": ranked
+                "count": int(len(need)),
+                "total_recommended_qty": int(recommended[need].sum()),
+                "total_estimated_cost": round(float(estimated_cost[need].sum()), 2),
+                "list": data_list
             }
         }, 200
 
     except Exception as e:
         return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 400
+
+
+# ========== 进货支出汇总接口 ==========
+@statistic_bp.route('/purchase/summary', methods=['GET'])
+def purchase_summary_view():
+    """
+    进货支出汇总
+    参数: from, to（YYYY-MM-DD，含两端，可省略）；group_by = supplier | isbn | month（默认 supplier）；
+          page（默认1）, page_size（默认100，最大1000）
+    每组返回进货数量、金额、平均进货价，以及按 t_supply_info 现行报价折算的平均价与价差；
+    已结束的完整月份读月度汇总表，只有区间两端不完整的月份和本月读进货单
+    """
+    group_by = request.args.get('group_by', 'supplier')
+    if group_by not in GROUPS:
+        return {"code": 400, "msg": f"group_by参数只能是{'、'.join(GROUPS)}"}, 400
+    try:
+        start, end = history_range(request.args)
+    except ValueError as e:
+        return {"code": 400, "msg": f"from/to参数错误: {e}"}, 400
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 100, type=int)
+    if page < 1:
+        page = 1
+    if page_size <= 0 or page_size > 1000:
+        page_size = 100
+
+    # 月初后首次请求顺带汇总刚结束的月份；落后太多（首次上线）时由 flask rollup-purchases 补建，期间读进货单。
+    # 批量请求的只读快照内不汇总，未汇总的月份照常读进货单
+    catch_up = 0 if in_read_snapshot() else current_app.config.get('PURCHASE_ROLLUP_CATCHUP_MONTHS', 2)
+    try:
+        pending = pending_months() if catch_up else []
+        if pending and len(pending) <= catch_up:
+            build_rollup()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"进货月度汇总失败: {e}")
+
+    try:
+        data = purchase_summary(group_by, start, end, page, page_size)
+        data.update({"group_by": group_by, "page": page, "page_size": page_size})
+        return {"code": 200, "msg": "成功", "data": data}, 200
+    except Exception as e:
+        return {"code": 400, "msg": f"Fail.Reason:{str(e)}"}, 400
+
+
+# ========== 请求合并计数 ==========
+@statistic_bp.route('/single-flight', methods=['GET'])
+def single_flight_stats():
+    """各接口请求合并计数：leaders 为实际执行次数，coalesced 为复用结果的请求数，fallbacks 为回退自行执行的次数"""
+    return {"code": 200, "msg": "成功", "data": single_flight.stats()}, 200
+
+
+@statistic_bp.route('/result-cache', methods=['GET'])
+def result_cache_stats():
+    """共享结果缓存的条目数、占用字节（所有 worker 共用）与本 worker 的命中、未命中、写入、作废计数"""
+    return {"code": 200, "msg": "成功", "data": result_cache.stats()}, 200
+
+
+@statistic_bp.route('/contention', methods=['GET'])
+def contention_stats():
+    """本 worker 进货、退货事务的锁冲突计数：transactions、retries、deadlock、lock_timeout、exhausted"""
+    return {"code": 200, "msg": "成功", "data": tx_retry.stats()}, 200
+
+
+# ========== 变更推送（SSE） ==========
+STREAM_EVENT_TYPES = ('stock', 'order', 'return', 'purchase')
+
+
+@statistic_bp.route('/stream', methods=['GET'])
+@token_in_query
+def stream():
+    """
+    推送写接口提交后的变更：stock（最新库存）、order、return、purchase。
+    参数: types（逗号分隔，默认全部）；EventSource 无法设置请求头，可用 access_token 参数传令牌。
+    连接建立后先发 retry 与注释行，客户端收到后应拉一次全量数据再按事件增量更新。
+    """
+    types = [t for t in request.args.get('types', '').split(',') if t]
+    unknown = [t for t in types if t not in STREAM_EVENT_TYPES]
+    if unknown:
+        return {"code": 400, "msg": f"types参数只能是{'、'.join(STREAM_EVENT_TYPES)}"}, 400
+
+    # 连接期间占一个准入总量名额，保证推送连接用不到留给写接口的线程
+    if not admission.hold():
+        return {"code": 503, "msg": "推送连接数已满，请稍后重试"}, 503, {"Retry-After": "30"}
+    subscriber = broker.subscribe(set(types) or None)
+    if subscriber is None:
+        admission.unhold()
+        return {"code": 503, "msg": "推送连接数已满，请稍后重试"}, 503, {"Retry-After": "30"}
+
+    config = current_app.config
+    body = iter_stream(
+        subscriber,
+        heartbeat=config.get('EVENTS_HEARTBEAT', 15),
+        max_seconds=config.get('EVENTS_MAX_SECONDS', 600),
+        retry_ms=config.get('EVENTS_RETRY_MS', 3000),
+    )
+    response = Response(body, mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+    # 响应体未开始迭代就被关闭时生成器的 finally 不会执行，在关闭回调中释放
+    @response.call_on_close
+    def close():
+        broker.unsubscribe(subscriber)
+        admission.unhold()
+
+    return response
+
+
+@statistic_bp.route('/stream/stats', methods=['GET'])
+def stream_stats():
+    """本 worker 的推送连接数与累计发布、投递、因缓冲区写满断开的次数"""
+    return {"code": 200, "msg": "成功", "data": broker.stats()}, 200
@@ -0,0 +1,142 @@
+import threading
+
+from flask import Response, current_app, g, request
+
+from app.admission import admission, busy_response
+from app.db import in_read_snapshot
+
+
+class Flight:
+    """一次进行中的计算：首个请求（leader）执行，其余相同请求等待其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    同一进程内相同的读请求（接口 + 查询参数）合并为一次计算。
+    leader 正常经过准入控制并执行视图，结果在 after_request 中发布；
+    等待中的 follower 占一个准入总量名额（等待期间同样占着线程，写接口的保留线程不能被它们占满），
+    拿不到名额时直接返回 503，之后复制 leader 的响应，不占接口名额和数据库。
+    leader 失败、被拒绝（5xx）或等待超时时 follower 回退为自行执行。
+    """
+
+    def __init__(self):
+        self.endpoints = set()
+        self.timeout = 30
+        self.counters = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.endpoints = set(app.config.get('SINGLE_FLIGHT_ENDPOINTS', []))
+        self.timeout = app.config.get('SINGLE_FLIGHT_TIMEOUT', 30)
+        with self._lock:
+            self.counters = {}
+            self._flights = {}
+
+    def _count(self, endpoint, name):
+        counter = self.counters.setdefault(endpoint, {"leaders": 0, "coalesced": 0, "fallbacks": 0})
+        counter[name] += 1
+
+    def join(self, key):
+        """返回 (flight, 是否为 leader)"""
+        endpoint = key[0]
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                self._count(endpoint, 'leaders')
+                return flight, True
+            flight.followers += 1
+            return flight, False
+
+    def publish(self, key, flight, response):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.response = response
+        flight.done.set()
+
+    def record(self, endpoint, name):
+        with self._lock:
+            self._count(endpoint, name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "endpoints": {name: dict(counter) for name, counter in sorted(self.counters.items())},
+            }
+
+
+single_flight = SingleFlight()
+
+
+def _flight_key():
+    # 批量请求的只读快照内须读本事务的数据，不复用其它请求的结果
+    if request.method != 'GET' or request.endpoint not in single_flight.endpoints or in_read_snapshot():
+        return None
+    return request.endpoint, tuple(sorted(request.args.items(multi=True)))
+
+
+def coalesce():
+    """before_request：已有相同请求在执行时等待并复用其响应"""
+    if not current_app.config.get('SINGLE_FLIGHT_ENABLED', True):
+        return None
+    key = _flight_key()
+    if key is None:
+        return None
+
+    flight, leader = single_flight.join(key)
+    if leader:
+        g.single_flight = (key, flight)
+        return None
+
+    held = admission.controlled(key[0])
+    if held and not admission.hold():
+        return busy_response()
+    try:
+        finished = flight.done.wait(single_flight.timeout)
+    finally:
+        if held:
+            admission.unhold()
+    if finished and flight.response is not None:
+        single_flight.record(key[0], 'coalesced')
+        body, status, headers = flight.response
+        response = Response(body, status=status, headers=headers)
+        response.headers['X-Single-Flight'] = 'shared'
+        return response
+    single_flight.record(key[0], 'fallbacks')
+    return None
+
+
+def share(response):
+    """after_request：leader 发布响应（只保留内容、状态码和头部，每个 follower 各自构造 Response）"""
+    flight = g.pop('single_flight', None)
+    if flight is not None:
+        key, flight = flight
+        shared = None
+        # 304 只对带 If-None-Match 的 leader 有效；5xx（如 leader 被准入控制拒绝）不复用；这两种 follower 各自执行
+        if not response.is_streamed and response.status_code != 304 and response.status_code < 500:
+            shared = (response.get_data(), response.status_code, list(response.headers.items()))
+        single_flight.publish(key, flight, shared)
+    return response
+
+
+def abandon(exc=None):
+    """teardown_request：leader 异常退出时唤醒 follower，由它们各自执行"""
+    flight = g.pop('single_flight', None)
+    if flight is not None:
+        key, flight = flight
+        single_flight.publish(key, flight, None)
+
+
+def init_single_flight(app):
+    single_flight.init_app(app)
+    app.before_request(coalesce)
+    app.after_request(share)
+    app.teardown_request(abandon)
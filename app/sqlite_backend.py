@@ -0,0 +1,347 @@
+"""
+嵌入式 SQLite 后端（DB_BACKEND=sqlite）：用 app/models.py 建表，并在 SQLite 中实现 MySQL 侧的 v_* 视图与 proc_* 存储过程，
+各蓝图的 SQL 不需要改动，适合单店终端和本地测试环境；bench 基准测试也使用这套实现。
+
+存储过程的实现方式：
+- 排行类过程（proc_daily_rank / proc_monthly_rank）改写为等价 SELECT；
+- 写入类过程（proc_purchase_book / proc_return_book）改写为对辅助视图的 INSERT，
+  由 INSTEAD OF 触发器完成多表写入，校验失败时用 RAISE(ABORT) 返回与 SIGNAL 相同的错误文本；
+- NOW() 等 MySQL 函数在连接建立时以 Python 函数注册。
+"""
+import re
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, text
+from sqlalchemy import types as sqltypes
+from sqlalchemy.dialects.sqlite import DATETIME
+from sqlalchemy.dialects.sqlite.base import SQLiteTypeCompiler
+
+from app.commands import create_missing_columns, create_missing_indexes
+from app.db import db
+from app.supply_index import refresh_supply_best
+from app.totals import TOTALS, backfill_totals
+
+
+VIEWS_SQL = """
+CREATE VIEW IF NOT EXISTS v_sales_records AS
+SELECT o.order_id, o.order_time, o.user_id, u.username,
+       COALESCE(SUM(od.order_qty * od.order_price), 0) AS total_amount
+FROM t_order o
+INNER JOIN t_user u ON u.user_id = o.user_id
+LEFT JOIN t_order_detail od ON od.order_id = o.order_id
+GROUP BY o.order_id, o.order_time, o.user_id, u.username;
+
+CREATE VIEW IF NOT EXISTS v_return_records AS
+SELECT r.return_id, r.order_id, r.return_time, r.reason, r.user_id, u.username,
+       COALESCE(SUM(rd.return_qty * od.order_price), 0) AS total_amount
+FROM t_return r
+INNER JOIN t_user u ON u.user_id = r.user_id
+LEFT JOIN t_return_detail rd ON rd.return_id = r.return_id
+LEFT JOIN t_order_detail od ON od.order_id = r.order_id AND od.isbn = rd.isbn
+GROUP BY r.return_id, r.order_id, r.return_time, r.reason, r.user_id, u.username;
+
+CREATE VIEW IF NOT EXISTS v_book_inventory AS
+SELECT b.isbn, b.title, b.author, b.publisher, b.price,
+       COALESCE(s.quantity, 0) AS quantity
+FROM t_book b
+LEFT JOIN t_stock s ON s.isbn = b.isbn;
+
+-- CROSS JOIN 固定连接顺序：先按 idx_order_time 取近一个月的订单，与 MySQL 上的计划一致
+CREATE VIEW IF NOT EXISTS v_inventory_shortage_warning AS
+SELECT b.isbn, b.title, b.author, b.publisher, b.price,
+       COALESCE(s.quantity, 0) AS quantity,
+       COALESCE(ls.last_month_sales, 0) AS last_month_sales
+FROM t_book b
+LEFT JOIN t_stock s ON s.isbn = b.isbn
+LEFT JOIN (
+    SELECT od.isbn, SUM(od.order_qty) AS last_month_sales
+    FROM t_order o
+    CROSS JOIN t_order_detail od ON od.order_id = o.order_id
+    WHERE o.order_time >= datetime('now', 'localtime', '-1 month')
+    GROUP BY od.isbn
+) ls ON ls.isbn = b.isbn
+WHERE COALESCE(s.quantity, 0) < 10
+   OR COALESCE(s.quantity, 0) < COALESCE(ls.last_month_sales, 0);
+
+CREATE VIEW IF NOT EXISTS v_purchase_record AS
+SELECT p.purchase_id, p.purchase_time,
+       p.supplier_id, sp.supplier_name,
+       p.isbn, b.title,
+       p.purchase_qty, p.purchase_price,
+       p.user_id, u.username
+FROM t_purchase p
+INNER JOIN t_supplier sp ON sp.supplier_id = p.supplier_id
+INNER JOIN t_book b ON b.isbn = p.isbn
+INNER JOIN t_user u ON u.user_id = p.user_id;
+
+CREATE VIEW IF NOT EXISTS v_supply_info AS
+SELECT si.supplier_id, sp.supplier_name, si.isbn, b.title, b.author, b.publisher, si.supply_price
+FROM t_supply_info si
+INNER JOIN t_supplier sp ON sp.supplier_id = si.supplier_id
+INNER JOIN t_book b ON b.isbn = si.isbn;
+"""
+
+
+PROCEDURES_SQL = """
+CREATE VIEW IF NOT EXISTS _proc_purchase_book AS
+SELECT NULL AS p_supplier_id, NULL AS p_isbn, NULL AS p_qty, NULL AS p_price, NULL AS p_user_id;
+
+CREATE TRIGGER IF NOT EXISTS _proc_purchase_book_call
+INSTEAD OF INSERT ON _proc_purchase_book
+BEGIN
+    INSERT INTO t_purchase (purchase_id, supplier_id, isbn, purchase_qty, purchase_price, purchase_time, user_id)
+    VALUES ((SELECT COALESCE(MAX(purchase_id), 0) + 1 FROM t_purchase),
+            NEW.p_supplier_id, NEW.p_isbn, NEW.p_qty, NEW.p_price,
+            strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'), NEW.p_user_id);
+    INSERT OR IGNORE INTO t_stock (isbn, quantity) VALUES (NEW.p_isbn, 0);
+    UPDATE t_stock SET quantity = quantity + NEW.p_qty WHERE isbn = NEW.p_isbn;
+END;
+
+CREATE VIEW IF NOT EXISTS _proc_return_book AS
+SELECT NULL AS p_return_id, NULL AS p_order_id, NULL AS p_isbn, NULL AS p_qty, NULL AS p_reason, NULL AS p_user_id;
+
+CREATE TRIGGER IF NOT EXISTS _proc_return_book_call
+INSTEAD OF INSERT ON _proc_return_book
+BEGIN
+    SELECT RAISE(ABORT, 'order detail not found')
+    WHERE NOT EXISTS (
+        SELECT 1 FROM t_order_detail WHERE order_id = NEW.p_order_id AND isbn = NEW.p_isbn
+    );
+    SELECT RAISE(ABORT, 'return quantity exceeds sold quantity')
+    WHERE NEW.p_qty + (
+        SELECT COALESCE(SUM(rd.return_qty), 0)
+        FROM t_return r
+        INNER JOIN t_return_detail rd ON rd.return_id = r.return_id
+        WHERE r.order_id = NEW.p_order_id AND rd.isbn = NEW.p_isbn
+    ) > (
+        SELECT order_qty FROM t_order_detail WHERE order_id = NEW.p_order_id AND isbn = NEW.p_isbn
+    );
+    INSERT INTO t_return (return_id, order_id, reason, return_time, user_id)
+    VALUES (NEW.p_return_id, NEW.p_order_id, NEW.p_reason,
+            strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'), NEW.p_user_id);
+    INSERT INTO t_return_detail (return_id, isbn, return_qty)
+    VALUES (NEW.p_return_id, NEW.p_isbn, NEW.p_qty);
+    INSERT OR IGNORE INTO t_stock (isbn, quantity) VALUES (NEW.p_isbn, 0);
+    UPDATE t_stock SET quantity = quantity + NEW.p_qty WHERE isbn = NEW.p_isbn;
+END;
+"""
+
+
+# CALL 语句改写模板：{args} 为原语句括号内的参数占位符，排行类使用 ?N 编号参数以便重复引用
+PROCEDURE_REWRITES = {
+    'proc_daily_rank': """
+        SELECT od.isbn, b.title, SUM(od.order_qty) AS total_sold
+        FROM t_order o
+        INNER JOIN t_order_detail od ON od.order_id = o.order_id
+        INNER JOIN t_book b ON b.isbn = od.isbn
+        WHERE o.order_time >= date(?1) AND o.order_time < date(?1, '+1 day')
+        GROUP BY od.isbn, b.title
+        ORDER BY total_sold DESC
+    """,
+    'proc_monthly_rank': """
+        SELECT od.isbn, b.title, SUM(od.order_qty) AS total_sold
+        FROM t_order o
+        INNER JOIN t_order_detail od ON od.order_id = o.order_id
+        INNER JOIN t_book b ON b.isbn = od.isbn
+        WHERE o.order_time >= printf('%04d-%02d-01', ?1, ?2)
+          AND o.order_time < date(printf('%04d-%02d-01', ?1, ?2), '+1 month')
+        GROUP BY od.isbn, b.title
+        ORDER BY total_sold DESC
+    """,
+    'proc_purchase_book': """
+        INSERT INTO _proc_purchase_book (p_supplier_id, p_isbn, p_qty, p_price, p_user_id)
+        VALUES ({args})
+    """,
+    'proc_return_book': """
+        INSERT INTO _proc_return_book (p_return_id, p_order_id, p_isbn, p_qty, p_reason, p_user_id)
+        VALUES ({args})
+    """,
+}
+
+_CALL_RE = re.compile(r'^\s*CALL\s+(\w+)\s*\((.*)\)\s*;?\s*$', re.IGNORECASE | re.DOTALL)
+
+# 每个连接建立时执行的 PRAGMA，可用 SQLITE_PRAGMAS 覆盖单项：
+# WAL 让读不阻塞写；synchronous=NORMAL 在 WAL 下只在检查点时刷盘；busy_timeout 让并发写排队而不是立即报错；
+# 负的 cache_size 单位为 KiB；临时表与排序放内存；mmap 减少读页时的系统调用
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,
+    'cache_size': -65536,
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,
+}
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _rewrite_call(conn, cursor, statement, parameters, context, executemany):
+    """把 CALL proc_xxx(...) 改写为 SQLite 可执行的等价语句"""
+    match = _CALL_RE.match(statement)
+    if match and match.group(1) in PROCEDURE_REWRITES:
+        statement = PROCEDURE_REWRITES[match.group(1)].format(args=match.group(2))
+    return statement, parameters
+
+
+def _connect_listener(pragmas):
+    def on_connect(dbapi_conn, connection_record):
+        dbapi_conn.create_function('NOW', 0, _now)
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return on_connect
+
+
+# 本引擎建表用的声明类型名：原生 SQL 查询不经过 ORM 类型处理，连接按声明类型（PARSE_DECLTYPES）把这两种列
+# 与 pymysql 一样转成 datetime / Decimal。只为这两个专用名字注册转换函数，不改动 sqlite3 对
+# DATETIME / NUMERIC 列和 datetime / Decimal 参数的全局处理（同进程的结果缓存等其它 SQLite 库不受影响）
+DATETIME_DECLTYPE = 'BSMS_DATETIME'
+NUMERIC_DECLTYPE = 'BSMS_NUMERIC'
+_LEGACY_DECLTYPE_RE = re.compile(r'(?<=\s)(DATETIME|NUMERIC)\b')
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+sqlite3.register_converter(DATETIME_DECLTYPE, lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter(NUMERIC_DECLTYPE, lambda value: Decimal(value.decode()))
+
+
+class _TypeCompiler(SQLiteTypeCompiler):
+    """DATETIME / NUMERIC 列使用专用声明类型名；SQLite 按名字判定的亲和性仍为 NUMERIC，存储方式不变"""
+
+    def visit_DATETIME(self, type_, **kw):
+        return DATETIME_DECLTYPE
+
+    def visit_NUMERIC(self, type_, **kw):
+        return NUMERIC_DECLTYPE + super().visit_NUMERIC(type_, **kw)[len('NUMERIC'):]
+
+
+def _adapt(value):
+    if isinstance(value, datetime):
+        return value.strftime(_DATETIME_FORMAT)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _adapt_row(parameters):
+    if isinstance(parameters, dict):
+        return {key: _adapt(value) for key, value in parameters.items()}
+    return tuple(_adapt(value) for value in parameters)
+
+
+def _adapt_parameters(conn, cursor, statement, parameters, context, executemany):
+    """原生 SQL 的 datetime / Decimal 参数不经过 ORM 类型处理，在本引擎上转成与 ORM 写入相同格式的字符串"""
+    if executemany:
+        return statement, [_adapt_row(row) for row in parameters]
+    return statement, _adapt_row(parameters) if parameters else parameters
+
+
+class _NativeDateTime(DATETIME):
+    """连接已按声明类型把 DATETIME 转成 datetime，ORM 侧不再做字符串解析"""
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+
+def engine_options():
+    """SQLALCHEMY_ENGINE_OPTIONS：开启按声明类型转换，连接可跨线程归还连接池"""
+    return {
+        'connect_args': {
+            'detect_types': sqlite3.PARSE_DECLTYPES,
+            'check_same_thread': False,
+        },
+    }
+
+
+def install(engine, pragmas=None):
+    """在引擎上挂载类型处理、CALL 改写与连接初始化，并丢弃挂载前已建立的连接"""
+    engine.dialect.type_compiler_instance = _TypeCompiler(engine.dialect)
+    engine.dialect.colspecs = dict(engine.dialect.colspecs)
+    engine.dialect.colspecs[sqltypes.DateTime] = _NativeDateTime
+    event.listen(engine, 'connect', _connect_listener({**PRAGMAS, **(pragmas or {})}))
+    event.listen(engine, 'before_cursor_execute', _rewrite_call, retval=True)
+    event.listen(engine, 'before_cursor_execute', _adapt_parameters, retval=True)
+    engine.dispose()
+
+
+def _install_views():
+    """重建全部视图与过程实现，使复用的旧数据库文件也能拿到最新定义"""
+    raw = db.engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        existing = conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('view', 'trigger')"
+        ).fetchall()
+        for kind, name in existing:
+            conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+        conn.executescript(VIEWS_SQL + PROCEDURES_SQL)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _retype_columns():
+    """
+    旧库文件中声明为 DATETIME / NUMERIC 的列改用专用声明类型名。两者亲和性相同、数据无需重写，
+    按 SQLite 文档中“不影响磁盘内容的表定义修改”的做法直接改 sqlite_master 并递增 schema_version
+    """
+    raw = db.engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        tables = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL").fetchall()
+        names = {'DATETIME': DATETIME_DECLTYPE, 'NUMERIC': NUMERIC_DECLTYPE}
+        changed = []
+        for name, sql in tables:
+            retyped = _LEGACY_DECLTYPE_RE.sub(lambda m: names[m.group(1)], sql)
+            if retyped != sql:
+                changed.append((name, retyped))
+        if not changed:
+            return False
+        version = conn.execute('PRAGMA schema_version').fetchone()[0]
+        conn.execute('PRAGMA writable_schema = ON')
+        for name, sql in changed:
+            conn.execute("UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?", (sql, name))
+        conn.execute(f'PRAGMA schema_version = {version + 1}')
+        conn.execute('PRAGMA writable_schema = OFF')
+        raw.commit()
+    finally:
+        raw.close()
+    db.engine.dispose()
+    return True
+
+
+def create_schema():
+    """在当前应用上下文中建表、建视图、建过程实现"""
+    import app.models  # noqa: F401  确保模型已注册到 metadata
+    db.create_all()
+    _install_views()
+
+
+def upgrade_schema():
+    """复用旧的数据库文件时改用专用声明类型名，补建新增的表、列与索引、重建视图，并刷新统计信息"""
+    import app.models  # noqa: F401
+    _retype_columns()
+    db.create_all()
+    if create_missing_columns():
+        for table in TOTALS:
+            backfill_totals(table)
+    _install_views()
+    if not db.session.execute(text("SELECT 1 FROM t_supply_best LIMIT 1")).first():
+        refresh_supply_best()
+        db.session.commit()
+    if create_missing_indexes():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+
+def init_sqlite(app):
+    """DB_BACKEND=sqlite 时在 db.init_app 之后调用：挂载到引擎，按 SQLITE_AUTO_SCHEMA 建表或升级库文件"""
+    with app.app_context():
+        install(db.engine, app.config.get('SQLITE_PRAGMAS'))
+        if app.config.get('SQLITE_AUTO_SCHEMA', True):
+            upgrade_schema()
@@ -0,0 +1,55 @@
+from sqlalchemy import bindparam, text
+
+from app.bulk import chunked
+from app.db import db
+
+
+_RANKED_SQL = """
+    SELECT isbn,
+           MAX(CASE WHEN rn = 1 THEN supplier_id END) AS best_supplier_id,
+           MAX(CASE WHEN rn = 1 THEN supply_price END) AS best_price,
+           MAX(CASE WHEN rn = 2 THEN supplier_id END) AS second_supplier_id,
+           MAX(CASE WHEN rn = 2 THEN supply_price END) AS second_price
+    FROM (
+        SELECT isbn, supplier_id, supply_price,
+               ROW_NUMBER() OVER (PARTITION BY isbn ORDER BY supply_price, supplier_id) AS rn
+        FROM t_supply_info
+        {where}
+    ) ranked
+    WHERE rn <= 2
+    GROUP BY isbn
+"""
+
+
+def refresh_supply_best(isbns=None, chunk_size=1000):
+    """
+    重算 t_supply_best 中指定 ISBN 的最低/次低报价；isbns 为 None 时全量重建。
+    在调用方的事务内执行，由调用方提交。
+    """
+    insert_sql = """
+        INSERT INTO t_supply_best (isbn, best_supplier_id, best_price, second_supplier_id, second_price)
+    """
+    if isbns is None:
+        db.session.execute(text("DELETE FROM t_supply_best"))
+        db.session.execute(text(insert_sql + _RANKED_SQL.format(where="")))
+        return
+
+    delete_sql = text("DELETE FROM t_supply_best WHERE isbn IN :isbns").bindparams(
+        bindparam('isbns', expanding=True)
+    )
+    rebuild_sql = text(insert_sql + _RANKED_SQL.format(where="WHERE isbn IN :isbns")).bindparams(
+        bindparam('isbns', expanding=True)
+    )
+    # 大批量变更（如整张价目表）按块重算，避免 IN 列表过长
+    for part in chunked(sorted(set(isbns)), chunk_size):
+        db.session.execute(delete_sql, {"isbns": part})
+        db.session.execute(rebuild_sql, {"isbns": part})
+
+
+def best_supply(isbn):
+    """按主键取某 ISBN 的最低价报价，返回 (supplier_id, supply_price) 或 None"""
+    row = db.session.execute(
+        text("SELECT best_supplier_id, best_price FROM t_supply_best WHERE isbn = :isbn"),
+        {"isbn": isbn}
+    ).fetchone()
+    return (row[0], row[1]) if row else None
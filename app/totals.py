@@ -0,0 +1,111 @@
+from sqlalchemy import bindparam, text
+
+from app.db import db
+
+
+# 每种单据：表名、主键、汇总明细金额与行数的子查询（按主键关联外层表）
+TOTALS = {
+    't_order': {
+        'key': 'order_id',
+        'amount': """
+            SELECT COALESCE(SUM(od.order_qty * od.order_price), 0)
+            FROM t_order_detail od WHERE od.order_id = t_order.order_id
+        """,
+        'lines': "SELECT COUNT(*) FROM t_order_detail od WHERE od.order_id = t_order.order_id",
+        'detail': """
+            SELECT order_id AS id, SUM(order_qty * order_price) AS amount, COUNT(*) AS line_count
+            FROM t_order_detail WHERE order_id IN :ids GROUP BY order_id
+        """,
+    },
+    't_return': {
+        'key': 'return_id',
+        'amount': """
+            SELECT COALESCE(SUM(rd.return_qty * od.order_price), 0)
+            FROM t_return_detail rd
+            INNER JOIN t_order_detail od ON od.order_id = t_return.order_id AND od.isbn = rd.isbn
+            WHERE rd.return_id = t_return.return_id
+        """,
+        'lines': "SELECT COUNT(*) FROM t_return_detail rd WHERE rd.return_id = t_return.return_id",
+        'detail': """
+            SELECT rd.return_id AS id, SUM(rd.return_qty * od.order_price) AS amount, COUNT(*) AS line_count
+            FROM t_return_detail rd
+            INNER JOIN t_return r ON r.return_id = rd.return_id
+            LEFT JOIN t_order_detail od ON od.order_id = r.order_id AND od.isbn = rd.isbn
+            WHERE rd.return_id IN :ids GROUP BY rd.return_id
+        """,
+    },
+}
+
+
+def refresh_totals(table, ids):
+    """按明细重算指定单据的 total_amount / line_count，在调用方的事务内执行"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    spec = TOTALS[table]
+    return db.session.execute(text(f"""
+        UPDATE {table}
+        SET total_amount = ({spec['amount']}),
+            line_count = ({spec['lines']})
+        WHERE {spec['key']} IN :ids
+    """).bindparams(bindparam('ids', expanding=True)), {"ids": ids}).rowcount
+
+
+def iter_id_batches(table, batch_size):
+    """按主键顺序分批取单据ID，每批一次索引范围扫描"""
+    key = TOTALS[table]['key']
+    last = None
+    while True:
+        if last is None:
+            rows = db.session.execute(
+                text(f"SELECT {key} FROM {table} ORDER BY {key} LIMIT :n"), {"n": batch_size}
+            )
+        else:
+            rows = db.session.execute(
+                text(f"SELECT {key} FROM {table} WHERE {key} > :last ORDER BY {key} LIMIT :n"),
+                {"last": last, "n": batch_size}
+            )
+        ids = [r[0] for r in rows]
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def backfill_totals(table, batch_size=5000):
+    """全表分批补算汇总列，每批提交一次；返回处理的单据数"""
+    done = 0
+    for ids in iter_id_batches(table, batch_size):
+        refresh_totals(table, ids)
+        db.session.commit()
+        done += len(ids)
+    return done
+
+
+def check_totals(table, batch_size=5000, fix=False):
+    """
+    分批核对汇总列与明细是否一致，返回 (核对的单据数, 不一致的单据ID列表)。
+    fix 为 True 时立即按明细修正不一致的单据。
+    """
+    spec = TOTALS[table]
+    detail_sql = text(spec['detail']).bindparams(bindparam('ids', expanding=True))
+    stored_sql = text(
+        f"SELECT {spec['key']}, total_amount, line_count FROM {table} WHERE {spec['key']} IN :ids"
+    ).bindparams(bindparam('ids', expanding=True))
+
+    checked, mismatched = 0, []
+    for ids in iter_id_batches(table, batch_size):
+        actual = {r.id: (r.amount or 0, r.line_count) for r in db.session.execute(detail_sql, {"ids": ids})}
+        bad = []
+        for key, amount, line_count in db.session.execute(stored_sql, {"ids": ids}):
+            expected_amount, expected_lines = actual.get(key, (0, 0))
+            if abs(float(amount or 0) - float(expected_amount)) > 0.005 or line_count != expected_lines:
+                bad.append(key)
+        if fix and bad:
+            refresh_totals(table, bad)
+            db.session.commit()
+        else:
+            db.session.rollback()
+        checked += len(ids)
+        mismatched.extend(bad)
+    return checked, mismatched
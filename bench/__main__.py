@@ -0,0 +1,81 @@
+"""
+接口基准测试入口，无需 MySQL：
+
+    python -m bench --books 100000 --order-lines 1000000
+    python -m bench --only statistic. order. --json bench_result.json
+    python -m bench --compare bench_result.json --tolerance 0.25
+
+数据库文件已存在时直接复用（生成百万级数据较慢），加 --reseed 重新生成。
+"""
+import argparse
+import json
+import os
+import sys
+
+from bench import runner, seed, sqlite_schema
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='BSMS 接口基准测试（SQLite 替身库）')
+    parser.add_argument('--db', default='bench_data.sqlite3', help='SQLite 数据库文件路径')
+    parser.add_argument('--reseed', action='store_true', help='删除已有数据库文件并重新生成数据')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--order-lines', type=int, default=100000)
+    parser.add_argument('--suppliers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365, help='订单时间跨度（天）')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--heavy-iterations', type=int, default=3, help='全表类接口的迭代次数')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', nargs='*', help='只测试以这些前缀开头的接口，例如 statistic. order.order_select')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='把结果写入 JSON 文件，可作为后续 --compare 的基线')
+    parser.add_argument('--compare', help='基线 JSON 文件，出现回归时以非零状态退出')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='p50 延迟允许的相对增幅')
+    args = parser.parse_args(argv)
+
+    if args.reseed:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    fresh = not os.path.exists(args.db)
+
+    app = sqlite_schema.build_app(args.db)
+    with app.app_context():
+        if fresh:
+            sqlite_schema.create_schema()
+            counts = seed.seed(books=args.books, order_lines=args.order_lines, suppliers=args.suppliers,
+                               days=args.days, seed_value=args.seed)
+            print('已生成数据:', ', '.join(f'{k}={v}' for k, v in counts.items()))
+        else:
+            sqlite_schema.upgrade_schema()
+
+    results = runner.run(app, iterations=args.iterations, heavy_iterations=args.heavy_iterations,
+                         warmup=args.warmup, only=args.only, seed_value=args.seed)
+
+    header = f"{'endpoint':<28}{'n':>5}{'p50ms':>10}{'p90ms':>10}{'p99ms':>10}{'maxms':>10}" \
+             f"{'queries':>9}{'peakKiB':>10}{'err':>5}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<28}{r['iterations']:>5}{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}{r['queries_per_request']:>9.1f}"
+              f"{r['peak_memory_kib']:>10.1f}{r['errors']:>5}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = runner.compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\n性能回归:')
+            for line in regressions:
+                print('  ' + line)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""逐个接口压测：延迟分位数、每请求 SQL 条数、峰值内存"""
+import math
+import random
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from sqlalchemy import event, text
+
+from app.db import db
+
+
+class QueryCounter:
+    """统计引擎实际下发到游标的语句条数"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def load_context(rng, sample_size=2000):
+    """读取生成参数所需的样本数据（日期范围、可用的进货/退货组合）"""
+    ctx = {}
+    rand = 'RAND()' if db.engine.dialect.name == 'mysql' else 'RANDOM()'
+    # 聚合结果没有声明类型，SQLite 下返回字符串
+    first, last = db.session.execute(text("SELECT MIN(order_time), MAX(order_time) FROM t_order")).fetchone()
+    ctx['first_time'] = first if isinstance(first, datetime) else datetime.fromisoformat(first)
+    ctx['last_time'] = last if isinstance(last, datetime) else datetime.fromisoformat(last)
+    ctx['isbns'] = [r[0] for r in db.session.execute(
+        text(f"SELECT isbn FROM t_book ORDER BY {rand} LIMIT :n"), {"n": sample_size}
+    )]
+    ctx['supply_pairs'] = [tuple(r) for r in db.session.execute(
+        text(f"SELECT supplier_id, isbn FROM t_supply_info ORDER BY {rand} LIMIT :n"), {"n": sample_size}
+    )]
+    ctx['returnable'] = [tuple(r) for r in db.session.execute(
+        text(f"""
+            SELECT od.order_id, od.isbn
+            FROM t_order_detail od
+            WHERE NOT EXISTS (SELECT 1 FROM t_return r WHERE r.order_id = od.order_id)
+            ORDER BY {rand} LIMIT :n
+        """), {"n": sample_size}
+    )]
+    rng.shuffle(ctx['returnable'])
+    ctx['token'] = db.session.execute(
+        text("SELECT token FROM t_token WHERE expire_time > NOW() ORDER BY user_id LIMIT 1")
+    ).scalar()
+    db.session.rollback()
+    return ctx
+
+
+def _random_day(rng, ctx):
+    first, last = ctx['first_time'], ctx['last_time']
+    span = max(0, (last.date() - first.date()).days)
+    return first.date().toordinal() + rng.randint(0, span)
+
+
+def _daily_rank_params(rng, ctx):
+    return {"date": date.fromordinal(_random_day(rng, ctx)).isoformat(), "limit": 10}
+
+
+def _monthly_rank_params(rng, ctx):
+    return {"month": date.fromordinal(_random_day(rng, ctx)).strftime('%Y-%m'), "limit": 10}
+
+
+def _sales_series_params(rng, ctx):
+    return {"from": ctx['first_time'].date().isoformat(), "to": ctx['last_time'].date().isoformat(),
+            "granularity": rng.choice(['day', 'week'])}
+
+
+def _order_insert_body(rng, ctx):
+    picked = rng.sample(ctx['isbns'], k=min(3, len(ctx['isbns'])))
+    return {"details": [{"isbn": isbn, "order_qty": 1} for isbn in picked]}
+
+
+def _purchase_insert_body(rng, ctx):
+    supplier_id, isbn = rng.choice(ctx['supply_pairs'])
+    return {"supplier_id": supplier_id, "isbn": isbn, "purchase_qty": 10}
+
+
+def _purchase_insert_auto_body(rng, ctx):
+    return {"supplier_id": "auto", "isbn": rng.choice(ctx['supply_pairs'])[1], "purchase_qty": 10}
+
+
+def _supply_best_params(rng, ctx):
+    return {"isbns": ",".join(rng.sample(ctx['isbns'], k=min(50, len(ctx['isbns']))))}
+
+
+def _return_insert_body(rng, ctx):
+    order_id, isbn = ctx['returnable'].pop()
+    return {"order_id": order_id, "reason": "bench", "details": [{"isbn": isbn, "return_qty": 1}]}
+
+
+# heavy=True 的接口会读取全表（或存在 N+1），单独使用较少的迭代次数
+SCENARIOS = [
+    {"name": "basic.book_select", "method": "GET", "path": "/basic/book/select",
+     "params": lambda rng, ctx: {"keyword": f"Book {rng.randint(0, 999)}", "limit": 100}},
+    {"name": "basic.supplier_select", "method": "GET", "path": "/basic/supplier/select",
+     "params": lambda rng, ctx: {"limit": 100}},
+    {"name": "basic.supply_info_best", "method": "GET", "path": "/basic/supply-info/best",
+     "params": _supply_best_params},
+    {"name": "basic.supply_info_select", "method": "GET", "path": "/basic/supply-info/select", "heavy": True},
+    {"name": "statistic.stock_select", "method": "GET", "path": "/statistic/stock/select", "heavy": True},
+    {"name": "statistic.stock_shortage", "method": "GET", "path": "/statistic/stock/shortage", "heavy": True},
+    {"name": "statistic.daily_rank", "method": "GET", "path": "/statistic/sales/rank/daily",
+     "params": _daily_rank_params},
+    {"name": "statistic.monthly_rank", "method": "GET", "path": "/statistic/sales/rank/monthly",
+     "params": _monthly_rank_params, "heavy": True},
+    {"name": "statistic.sales_series", "method": "GET", "path": "/statistic/sales/series",
+     "params": _sales_series_params, "heavy": True},
+    {"name": "statistic.reorder_plan", "method": "GET", "path": "/statistic/reorder/plan", "heavy": True},
+    {"name": "order.order_select", "method": "GET", "path": "/order/select", "heavy": True},
+    {"name": "return.return_select", "method": "GET", "path": "/return/select", "heavy": True},
+    {"name": "purchase.purchase_select", "method": "GET", "path": "/purchase/select", "heavy": True},
+    {"name": "order.order_insert", "method": "POST", "path": "/order/insert", "json": _order_insert_body},
+    {"name": "purchase.purchase_insert", "method": "POST", "path": "/purchase/insert",
+     "json": _purchase_insert_body},
+    {"name": "purchase.purchase_insert_auto", "method": "POST", "path": "/purchase/insert",
+     "json": _purchase_insert_auto_body},
+    {"name": "return.return_insert", "method": "POST", "path": "/return/insert", "json": _return_insert_body},
+]
+
+
+def percentile(sorted_values, pct):
+    """最近秩法分位数"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _request(client, scenario, rng, ctx):
+    kwargs = {"method": scenario["method"], "headers": {"Authorization": f"Bearer {ctx['token']}"}}
+    if "params" in scenario:
+        kwargs["query_string"] = scenario["params"](rng, ctx)
+    if "json" in scenario:
+        kwargs["json"] = scenario["json"](rng, ctx)
+    response = client.open(scenario["path"], **kwargs)
+    body = response.get_json(silent=True)
+    ok = response.status_code == 200 and (not isinstance(body, dict) or body.get("code", 200) == 200)
+    return ok
+
+
+def run_scenario(app, counter, scenario, iterations, warmup, rng, ctx):
+    client = app.test_client()
+    for _ in range(warmup):
+        _request(client, scenario, rng, ctx)
+
+    latencies = []
+    queries = 0
+    errors = 0
+    for _ in range(iterations):
+        before = counter.count
+        started = time.perf_counter()
+        ok = _request(client, scenario, rng, ctx)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries += counter.count - before
+        errors += 0 if ok else 1
+
+    # 峰值内存单独测一次，避免 tracemalloc 的开销混入延迟
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    _request(client, scenario, rng, ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "endpoint": scenario["name"],
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "queries_per_request": round(queries / iterations, 2) if iterations else 0.0,
+        "peak_memory_kib": round(peak / 1024, 1),
+        "errors": errors,
+    }
+
+
+def run(app, iterations=30, heavy_iterations=3, warmup=2, only=None, seed_value=42):
+    rng = random.Random(seed_value)
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        ctx = load_context(rng)
+        results = []
+        for scenario in SCENARIOS:
+            if only and not any(scenario["name"].startswith(prefix) for prefix in only):
+                continue
+            n = heavy_iterations if scenario.get("heavy") else iterations
+            results.append(run_scenario(app, counter, scenario, n, min(warmup, n), rng, ctx))
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较：p50 延迟超出容差或 SQL 条数增加即视为回归"""
+    base_by_name = {r["endpoint"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = base_by_name.get(r["endpoint"])
+        if not base:
+            continue
+        if r["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f'{r["endpoint"]}: p50 {base["p50_ms"]}ms -> {r["p50_ms"]}ms')
+        if r["queries_per_request"] > base["queries_per_request"]:
+            regressions.append(
+                f'{r["endpoint"]}: queries {base["queries_per_request"]} -> {r["queries_per_request"]}')
+    return regressions
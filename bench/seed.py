@@ -0,0 +1,128 @@
+"""按给定规模生成可复现的基准数据（固定随机种子）"""
+import random
+from datetime import datetime, timedelta
+
+from app.db import db
+from app.supply_index import refresh_supply_best
+from app.totals import TOTALS, backfill_totals
+
+
+def _isbn(n):
+    return f'978{n:010d}'
+
+
+def _insert(cursor, table, columns, rows):
+    placeholders = ', '.join('?' for _ in columns)
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows
+    )
+
+
+def seed(books=10000, order_lines=100000, suppliers=200, users=20, days=365,
+         return_ratio=0.02, seed_value=42, batch_size=50000):
+    """
+    直接用 sqlite3 批量写入，绕开 ORM 以便在合理时间内生成百万级明细。
+    返回各表行数。
+    """
+    rng = random.Random(seed_value)
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    fmt = '%Y-%m-%d %H:%M:%S.%f'
+
+    raw = db.engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        cursor = conn.cursor()
+
+        _insert(cursor, 't_role', ['role_id', 'role_name'], [(1, 'admin'), (2, 'clerk')])
+        _insert(cursor, 't_user', ['user_id', 'username', 'password', 'role_id'],
+                [(i, f'user{i}', 'x' * 64, 1 if i == 1 else 2) for i in range(1, users + 1)])
+        _insert(cursor, 't_token', ['token_id', 'user_id', 'token', 'expire_time'],
+                [(i, i, f'token-{i:08d}', (now + timedelta(days=1)).strftime(fmt)) for i in range(1, users + 1)])
+        _insert(cursor, 't_supplier', ['supplier_id', 'supplier_name'],
+                [(i, f'Supplier {i}') for i in range(1, suppliers + 1)])
+
+        prices = {}
+        book_rows, stock_rows, supply_rows = [], [], []
+        for n in range(books):
+            isbn = _isbn(n)
+            price = round(rng.uniform(10, 200), 2)
+            prices[isbn] = price
+            book_rows.append((isbn, f'Book {n}', f'Author {n % 5000}', f'Publisher {n % 300}', price))
+            stock_rows.append((isbn, rng.randint(0, 500)))
+            for supplier_id in rng.sample(range(1, suppliers + 1), k=min(suppliers, rng.randint(1, 3))):
+                supply_rows.append((supplier_id, isbn, round(price * rng.uniform(0.5, 0.8), 2)))
+        _insert(cursor, 't_book', ['isbn', 'title', 'author', 'publisher', 'price'], book_rows)
+        _insert(cursor, 't_stock', ['isbn', 'quantity'], stock_rows)
+        _insert(cursor, 't_supply_info', ['supplier_id', 'isbn', 'supply_price'], supply_rows)
+        del book_rows, stock_rows
+
+        purchase_rows = []
+        for purchase_id, (supplier_id, isbn, supply_price) in enumerate(supply_rows, start=1):
+            purchase_time = start + timedelta(seconds=rng.randint(0, days * 86400))
+            purchase_rows.append((purchase_id, supplier_id, isbn, rng.randint(10, 200), supply_price,
+                                  purchase_time.strftime(fmt), rng.randint(1, users)))
+        _insert(cursor, 't_purchase',
+                ['purchase_id', 'supplier_id', 'isbn', 'purchase_qty', 'purchase_price', 'purchase_time', 'user_id'],
+                purchase_rows)
+        del supply_rows, purchase_rows
+
+        # 订单按时间递增生成，每单 1~5 行明细
+        isbns = list(prices)
+        order_id = 0
+        return_id = 0
+        lines = 0
+        step = days * 86400 / max(1, order_lines / 3)
+        clock = start.timestamp()
+        orders, details, returns, return_details = [], [], [], []
+        while lines < order_lines:
+            order_id += 1
+            clock += rng.expovariate(1 / step)
+            order_time = datetime.fromtimestamp(min(clock, now.timestamp()))
+            user_id = rng.randint(1, users)
+            orders.append((order_id, order_time.strftime(fmt), user_id))
+            picked = rng.sample(isbns, k=min(len(isbns), rng.randint(1, 5), order_lines - lines))
+            for isbn in picked:
+                qty = rng.randint(1, 3)
+                details.append((order_id, isbn, qty, prices[isbn]))
+            lines += len(picked)
+
+            if rng.random() < return_ratio:
+                return_id += 1
+                return_time = order_time + timedelta(days=rng.randint(0, 14))
+                returns.append((return_id, order_id, 'damaged', return_time.strftime(fmt), user_id))
+                return_details.append((return_id, picked[0], 1))
+
+            if len(details) >= batch_size:
+                _insert(cursor, 't_order', ['order_id', 'order_time', 'user_id'], orders)
+                _insert(cursor, 't_order_detail', ['order_id', 'isbn', 'order_qty', 'order_price'], details)
+                orders, details = [], []
+
+        _insert(cursor, 't_order', ['order_id', 'order_time', 'user_id'], orders)
+        _insert(cursor, 't_order_detail', ['order_id', 'isbn', 'order_qty', 'order_price'], details)
+        _insert(cursor, 't_return', ['return_id', 'order_id', 'reason', 'return_time', 'user_id'], returns)
+        _insert(cursor, 't_return_detail', ['return_id', 'isbn', 'return_qty'], return_details)
+
+        conn.commit()
+    finally:
+        raw.close()
+
+    refresh_supply_best()
+    db.session.commit()
+    for table in TOTALS:
+        backfill_totals(table, batch_size)
+
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.driver_connection.cursor()
+        cursor.execute('ANALYZE')
+
+        counts = {}
+        for table in ('t_book', 't_supplier', 't_supply_info', 't_purchase',
+                      't_order', 't_order_detail', 't_return', 't_return_detail'):
+            counts[table] = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        cursor.close()
+        return counts
+    finally:
+        raw.close()
@@ -0,0 +1,24 @@
+"""
+SQLite 替身库：直接使用应用的嵌入式 SQLite 后端（app/sqlite_backend.py），
+建表、视图与存储过程实现都在那里；这里只负责创建指向基准测试库文件的应用实例。
+"""
+import os
+
+from app import create_app
+from app.config import Config
+from app.sqlite_backend import create_schema, upgrade_schema  # noqa: F401  (bench 入口经本模块调用)
+
+
+def build_app(db_path):
+    """创建指向 SQLite 替身库的应用实例；建表或升级由调用方按库文件是否已存在决定"""
+    class BenchConfig(Config):
+        DB_BACKEND = 'sqlite'
+        SQLITE_PATH = os.path.abspath(db_path)
+        SQLITE_AUTO_SCHEMA = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{SQLITE_PATH}"
+        SQLALCHEMY_ECHO = False
+        TOKEN_REAPER_ENABLED = False
+        # 计时不受慢请求落盘影响
+        PROFILE_SLOW_THRESHOLD_MS = 0
+
+    return create_app(BenchConfig)
@@ -0,0 +1,52 @@
+"""
+生产环境 pre-fork 启动配置：
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+master 预加载应用后 fork 出 WEB_WORKERS 个 worker，每个 worker 用 WEB_THREADS 个线程处理请求；
+worker 处理 WEB_MAX_REQUESTS 个请求后自动重启，由于应用已预加载，重启只是一次 fork。
+"""
+import os
+import shutil
+
+# 各 worker 的 Prometheus 指标写入该目录，/metrics 汇总；
+# 须在导入 app（及 prometheus_client）之前设置
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.getenv('METRICS_MULTIPROC_DIR', '/tmp/bsms_metrics')
+)
+# 清掉上次运行留下的指标文件
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# 各 worker 在该目录下绑定 Unix 套接字互相转发 /statistic/stream 事件；同机其它实例可共用
+os.environ.setdefault('EVENTS_RELAY_DIR', '/tmp/bsms_events')
+
+# 各 worker 共用的读结果缓存文件；启动时清空，避免沿用上次运行期间可能已被改动的数据
+result_cache_path = os.environ.setdefault('RESULT_CACHE_PATH', '/tmp/bsms_cache/results.sqlite3')
+for suffix in ('', '-wal', '-shm'):
+    try:
+        os.remove(result_cache_path + suffix)
+    except FileNotFoundError:
+        pass
+
+from app.config import Config  # noqa: E402
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+timeout = Config.WEB_TIMEOUT
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = Config.WEB_MAX_REQUESTS_JITTER
+preload_app = True
+
+
+def post_fork(server, worker):
+    # 预加载时 master 已建立过数据库连接，子进程不能复用父进程的连接池
+    from app.db import dispose_after_fork
+    dispose_after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
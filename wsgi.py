@@ -0,0 +1,4 @@
+from app import create_app
+
+# 生产环境 WSGI 入口：gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()